@@ -0,0 +1,138 @@
+"""
+asyncio fetch engine for the sous chef.
+
+Pages are read and stored through the same cachecontrol `CacheController` and
+cache (e.g. `FileCache('.webcache')`) used by the `CacheControlAdapter`s mounted
+on the requests session, so a page fetched here is a cache hit for
+`downloader.read` and vice versa. The requests are sent with the headers of
+the requests session, cachecontrol only matches an entry stored with a
+`Vary` header when the request has the same values.
+"""
+
+import asyncio
+import io
+
+import aiohttp
+import requests
+from cachecontrol.controller import CacheController
+from urllib3 import HTTPResponse
+
+
+# Headers that don't describe the body we store, aiohttp already decompressed it
+DROP_HEADERS = ["content-encoding", "content-length", "transfer-encoding"]
+
+
+class AsyncFetcher(object):
+    """
+        Fetch urls concurrently with a bounded number of connections
+
+        Args:
+            cache: cachecontrol cache shared with the requests session
+            heuristics (dict): url prefix -> cachecontrol heuristic, the longest
+                matching prefix wins, like `requests.Session.mount`
+            limit (int): max number of open connections
+            limit_per_host (int): max number of open connections to one host
+            rate_limiter: object with a `reserve(url)` method returning the
+                seconds to wait before the request can go to the network (optional)
+            headers (dict): headers of the requests session sharing the cache,
+                requests' default headers when None
+    """
+    def __init__(self, cache, heuristics=None, limit=100, limit_per_host=20, rate_limiter=None, headers=None):
+        self.cache = cache
+        self.headers = dict(headers if headers is not None else requests.utils.default_headers())
+        self.controller = CacheController(cache, cache_etags=True)
+        self.heuristics = heuristics or {}
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.rate_limiter = rate_limiter
+        self.session = None
+        self.hits = 0
+        self.misses = 0
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host)
+        self.session = aiohttp.ClientSession(connector=connector)
+        return self
+
+    async def __aexit__(self, type, value, traceback):
+        await self.session.close()
+
+    def heuristic(self, url):
+        prefixes = [prefix for prefix in self.heuristics if url.startswith(prefix)]
+        if len(prefixes) > 0:
+            return self.heuristics[max(prefixes, key=len)]
+
+    def request(self, url):
+        """
+            The GET of url as the requests session prepares it, the key of its cache entry
+        """
+        return requests.Request("GET", url, headers=self.headers).prepare()
+
+    async def fetch(self, url):
+        """
+            Return the body of url, from the cache when possible.
+            Raises requests.exceptions.HTTPError like `downloader.read`.
+        """
+        request = self.request(url)
+        cached_response = self.controller.cached_request(request)
+        if cached_response:
+            self.hits += 1
+            return cached_response.read(decode_content=True)
+
+        self.misses += 1
+        return await self.download(request)
+
+    async def download(self, request):
+        """
+            Send request with the ETag/Last-Modified of its cache entry, if
+            any, and update the cache with the response
+        """
+        url = request.url
+        request.headers.update(self.controller.conditional_headers(request))
+        if self.rate_limiter is not None:
+            await asyncio.sleep(self.rate_limiter.reserve(url))
+        async with self.session.get(url, headers=dict(request.headers)) as response:
+            body = await response.read()
+            status = response.status
+            reason = response.reason
+            headers = [(k, v) for k, v in response.headers.items() if k.lower() not in DROP_HEADERS]
+
+        raw = HTTPResponse(body=io.BytesIO(body), headers=headers, status=status,
+            reason=reason, preload_content=False, decode_content=False)
+        heuristic = self.heuristic(url)
+        if heuristic is not None:
+            raw = heuristic.apply(raw)
+        if status == 304:
+            cached_response = self.controller.update_cached_response(request, raw)
+            return cached_response.read(decode_content=True)
+        if status >= 400:
+            raise requests.exceptions.HTTPError("{} Error: {} for url: {}".format(status, reason, url))
+        self.controller.cache_response(request, raw, body=body)
+        return body
+
+    async def revalidate(self, url):
+        """
+            Send a conditional request for url even if its cache entry is
+            still fresh. Returns True if the page changed or wasn't cached,
+            False on a 304 or when the server sent the same body again.
+        """
+        request = self.request(url)
+        cached_response = self.controller.cached_request(request)
+        cached_body = cached_response.read(decode_content=True) if cached_response else None
+        self.misses += 1
+        body = await self.download(request)
+        return body != cached_body
+
+    async def fetch_all(self, urls):
+        """
+            Fetch every url concurrently, returns a list with the body of each
+            url or the HTTPError it raised, in the same order as urls
+        """
+        return await asyncio.gather(*[self.fetch(url) for url in urls], return_exceptions=True)
+
+    async def revalidate_all(self, urls):
+        """
+            Revalidate every url concurrently, returns a list with the result
+            of revalidate() or the HTTPError it raised, in the same order as urls
+        """
+        return await asyncio.gather(*[self.revalidate(url) for url in urls], return_exceptions=True)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Checks that moving a stage to another BeautifulSoup backend doesn't change
+what the chef extracts from recorded pages, and times each backend.
+
+    python benchmarks/compare_parsers.py --stage lesson page.html http://edsitement.neh.gov/lesson-plan/...
+
+Pages can be files or urls, urls are read through the chef's session so
+recorded pages come from .webcache. Every backend is compared with the
+backend the stage uses today; the exit status is 1 if any extracted text differs.
+"""
+import argparse
+from collections import OrderedDict
+import logging
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+import souschef
+
+
+def extract_lesson(page, source):
+    lesson_plan = souschef.LessonPlan(page,
+        lesson_filename=os.devnull, resources_filename=os.devnull)
+    lesson_plan.write_sections()
+    extracted = OrderedDict([("title", lesson_plan.title)])
+    for filepath, (_, _, contents) in lesson_plan.package.members.items():
+        if not filepath.startswith("css/") and not filepath.startswith("js/"):
+            extracted[filepath] = contents
+    extracted["pdfs"] = repr(lesson_plan.resources.get_pdfs())
+    return extracted
+
+
+def extract_resource(page, source):
+    student_resource = souschef.StudentResourceIndex(page)
+    return OrderedDict([
+        ("content", student_resource.get_content()),
+        ("credits", student_resource.get_credits()),
+        ("viewmore", student_resource.get_viewmore()),
+    ])
+
+
+def extract_webpage(page, source):
+    content, files = souschef.WebPageSource(source).extract(page)
+    return OrderedDict([("content", str(content)), ("files", repr(files))])
+
+
+EXTRACTORS = {
+    "lesson": extract_lesson,
+    "resource": extract_resource,
+    "webpage": extract_webpage,
+}
+
+
+def read(source):
+    if os.path.isfile(source):
+        with open(source, "rb") as f:
+            return f.read()
+    return souschef.downloader.read(source, session=souschef.sess)
+
+
+def text(html):
+    return re.sub(r"\s+", " ", BeautifulSoup(html, "html.parser").get_text()).strip()
+
+
+def compare(reference, other):
+    if reference == other:
+        return "same"
+    elif text(reference) == text(other):
+        return "same text"
+    return "DIFF"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the chef's extraction across parser backends.")
+    parser.add_argument("--stage", choices=sorted(EXTRACTORS), default="lesson")
+    parser.add_argument("pages", nargs="+", help="Files or urls of recorded pages")
+    args = parser.parse_args()
+    souschef.LOGGER.setLevel(logging.WARNING)
+
+    reference_backend = souschef.PARSERS[args.stage]
+    backends = [reference_backend] + [b for b in souschef.PARSER_BACKENDS if b != reference_backend]
+    timings = OrderedDict((backend, 0.0) for backend in backends)
+    diffs = 0
+    for source in args.pages:
+        page_contents = read(source)
+        results = OrderedDict()
+        for backend in backends:
+            start = time.perf_counter()
+            page = BeautifulSoup(page_contents, backend)
+            results[backend] = EXTRACTORS[args.stage](page, source)
+            timings[backend] += time.perf_counter() - start
+
+        print(source)
+        reference = results[reference_backend]
+        for backend in backends[1:]:
+            for key, value in reference.items():
+                status = compare(value, results[backend].get(key, ""))
+                if status == "DIFF":
+                    diffs += 1
+                if status != "same":
+                    print("  {:12} {:40} {}".format(backend, key[:40], status))
+        print("  checked {} fields".format(len(reference)))
+
+    print("\nparse + extract time for {} page(s)".format(len(args.pages)))
+    for backend, seconds in timings.items():
+        print("  {:12} {:8.2f} ms/page".format(backend, seconds * 1000 / len(args.pages)))
+    sys.exit(1 if diffs > 0 else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Per-lesson time spent finding the lesson sections, with a page.find() over the
+whole tree for each section (the old way) and with the one-walk ElementIndex.
+
+    python benchmarks/element_index.py [lesson.html ...]
+
+Without arguments a synthetic page shaped like an EDSITEment lesson plan is used.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+import souschef
+
+
+REPEAT = 20
+
+
+def synthetic_lesson():
+    nav = "".join('<li class="menu-item"><a href="/n/{0}">Link {0}</a></li>'.format(i) for i in range(800))
+    paragraphs = "".join("<p>Paragraph {0} with <a href='/x/{0}'>a link</a> and <em>text</em>.</p>".format(i) for i in range(150))
+    sections = "".join('<div id="{}"><h4>Section</h4><div class="text">{}</div></div>'.format(id_, paragraphs)
+        for id_ in ["sect-introduction", "sect-questions", "sect-objectives", "sect-background",
+                    "sect-preparation", "sect-activities", "sect-assessment", "sect-extending"])
+    return ('<html><body><ul class="nav">{nav}</ul><div id="description"><h1>Lesson</h1></div>'
+        '<div id="sect-thelesson"><h4>Introduction</h4><h4>Background</h4></div>{sections}'
+        '<div id="sect-thebasics">{paragraphs}</div><div id="sect-resources">{paragraphs}</div>'
+        '<ul class="footer">{nav}</ul></body></html>').format(nav=nav, sections=sections, paragraphs=paragraphs)
+
+
+def lookup_sections(page):
+    package = souschef.ZipPackage(os.devnull)
+    page.find("div", id="description")
+    souschef.Menu(page, package=package, id_="sect-thelesson")
+    for Section in [souschef.Introduction, souschef.GuidingQuestions, souschef.LearningObjetives,
+                    souschef.Background, souschef.PreparationInstructions, souschef.LessonActivities,
+                    souschef.Assessment, souschef.ExtendingTheLesson, souschef.TheBasics]:
+        Section(page, package=package)
+    souschef.Resources(page)
+
+
+def bench(name, html):
+    page = BeautifulSoup(html, "html5lib")
+    find_time = timeit.timeit(lambda: lookup_sections(page), number=REPEAT) / REPEAT
+    index_time = timeit.timeit(lambda: lookup_sections(souschef.ElementIndex(page)), number=REPEAT) / REPEAT
+    print("{}: {} tags".format(name, len(page.find_all(True))))
+    print("  page.find     {:8.2f} ms/lesson".format(find_time * 1000))
+    print("  ElementIndex  {:8.2f} ms/lesson ({:.1f}x)".format(index_time * 1000, find_time / index_time))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            with open(path, "rb") as f:
+                bench(path, f.read())
+    else:
+        bench("synthetic lesson", synthetic_lesson())
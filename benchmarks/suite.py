@@ -0,0 +1,430 @@
+#!/usr/bin/env python
+"""
+Offline benchmark of the chef's stages over a recorded EDSITEment corpus.
+
+    python benchmarks/suite.py record [--subjects 2 --lessons 5 --resources 10]
+    python benchmarks/suite.py run [--save-baseline]
+
+`record` runs the chef (without videos) and stores every response read through
+its sessions, subject listings, lesson plans, student resources, linked web
+pages and their PDFs/images, in benchmarks/fixtures/, with the chefdata/ css
+and js the html5 zips include. Pages already in .webcache are recorded from there.
+
+`run` replays the corpus with the network disabled through lesson_plans,
+LessonPlan.to_file, StudentResourceIndex.to_file and WebPageSource.to_file.
+Each stage runs in a new process so its peak RSS is its own. pages/sec,
+zip bytes/sec and peak RSS are compared with benchmarks/baselines.json and
+the exit status is 1 if a stage is slower or bigger than --tolerance allows.
+"""
+import argparse
+from collections import OrderedDict
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import queue as queue_module
+import resource
+import shutil
+import socket
+import sys
+import tempfile
+import time
+import warnings
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+FIXTURES_DIR = os.path.join(REPO, "benchmarks", "fixtures")
+# the css/js of the html5 zips, read relative to the working directory
+ASSETS_DIR = "chefdata"
+BASELINES = os.path.join(REPO, "benchmarks", "baselines.json")
+KEEP_HEADERS = ["content-type", "location"]
+# settings of the chef saved with the corpus, so the replay walks the same slices
+SETTINGS = ["LESSON_PLANS_SUBJECT_END", "LESSON_PLANS_END",
+            "STUDENT_RESOURCE_SUBJECT_END", "STUDENT_RESOURCE_END"]
+
+
+# Fixtures
+################################################################################
+class Fixtures(object):
+    """
+        Recorded responses, index.json maps each url to its status, headers
+        and the file with its body
+    """
+    def __init__(self, path):
+        self.path = path
+        self.index_path = os.path.join(path, "index.json")
+        self.settings = {}
+        self.responses = {}
+        self.reads = 0
+
+    def load(self):
+        with open(self.index_path) as f:
+            index = json.load(f)
+        self.settings = index["settings"]
+        self.responses = index["responses"]
+        return self
+
+    def save(self):
+        with open(self.index_path, "w") as f:
+            json.dump({"settings": self.settings, "responses": self.responses}, f, indent=1, sort_keys=True)
+
+    def add(self, url, status, headers, body):
+        filename = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        with open(os.path.join(self.path, filename), "wb") as f:
+            f.write(body)
+        self.responses[url] = {"status": status, "file": filename,
+            "headers": {k: v for k, v in headers.items() if k.lower() in KEEP_HEADERS}}
+
+    def body(self, url):
+        with open(os.path.join(self.path, self.responses[url]["file"]), "rb") as f:
+            return f.read()
+
+
+class RecordingAdapter(BaseAdapter):
+    """
+        Sends through the session's adapter (so .webcache still answers)
+        and records the response
+    """
+    def __init__(self, adapter, fixtures):
+        super(RecordingAdapter, self).__init__()
+        self.adapter = adapter
+        self.fixtures = fixtures
+
+    def send(self, request, *args, **kw):
+        response = self.adapter.send(request, *args, **kw)
+        self.fixtures.add(request.url, response.status_code, response.headers, response.content)
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class FixtureAdapter(BaseAdapter):
+    """
+        Answers every request from the fixtures, urls that weren't recorded are a 404
+    """
+    def __init__(self, fixtures):
+        super(FixtureAdapter, self).__init__()
+        self.fixtures = fixtures
+
+    def send(self, request, *args, **kw):
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        self.fixtures.reads += 1
+        entry = self.fixtures.responses.get(request.url)
+        if entry is None:
+            response.status_code = 404
+            response.reason = "Not Recorded"
+            response.raw = io.BytesIO(b"")
+        else:
+            response.status_code = entry["status"]
+            response.reason = requests.status_codes._codes.get(entry["status"], [""])[0].upper()
+            response.headers = CaseInsensitiveDict(entry["headers"])
+            # a stream like a real response, prefetch reads it with iter_content
+            response.raw = io.BytesIO(self.fixtures.body(request.url))
+        return response
+
+    def close(self):
+        pass
+
+
+def sessions(souschef):
+    # downloader.read and the html/data writers use DOWNLOAD_SESSION, the chef's own calls use sess
+    return [souschef.sess, souschef.downloader.DOWNLOAD_SESSION]
+
+
+def disable_network():
+    """
+        Anything that isn't served by the fixtures (e.g. youtube_dl) fails fast
+    """
+    def disabled(*args, **kwargs):
+        raise socket.gaierror("network access is disabled by the benchmark")
+    socket.getaddrinfo = disabled
+    socket.create_connection = disabled
+
+
+def setup_chef(workdir, fixtures=None):
+    """
+        Import the chef with its stages writing into workdir, which is the
+        working directory, returns the module and an open DataWriter
+    """
+    os.chdir(workdir)
+    if fixtures is not None:
+        shutil.copytree(os.path.join(fixtures.path, ASSETS_DIR), ASSETS_DIR)
+    import souschef
+    from journal import Journal
+    souschef.LOGGER.setLevel(logging.WARNING)
+    souschef.DOWNLOAD_VIDEOS = False
+    souschef.RATE_LIMITER.set_rates({group: 0 for group in souschef.RATE_LIMITS})
+    souschef.JOURNAL = Journal(os.path.join(workdir, "bench.journal.jsonl"))
+    souschef.tmp_filename = lambda prefix, name: os.path.join(workdir,
+        "{}-{}-{}.zip".format(prefix, name, next(souschef.TMP_COUNTER)))
+    if fixtures is not None:
+        for name, value in fixtures.settings.items():
+            setattr(souschef, name, value)
+        for session in sessions(souschef):
+            for prefix in list(session.adapters):
+                if not prefix.startswith("file"):
+                    session.mount(prefix, FixtureAdapter(fixtures))
+    writer = souschef.data_writer.DataWriter(write_to_path=os.path.join(workdir, "bench.zip"))
+    writer.__enter__()
+    souschef.writer = writer
+    return souschef, writer
+
+
+# Stages
+################################################################################
+def zip_bytes(writer):
+    return sum(info.compress_size for info in writer.zf.infolist())
+
+
+def lesson_plan_urls(souschef):
+    return list(souschef.lesson_plans(souschef.lesson_plans_subject(souschef.LESSONS_PLANS_URL)))
+
+
+def student_resource_urls(souschef):
+    return list(souschef.student_resources())
+
+
+def stage_lesson_plans(souschef, writer, fixtures):
+    """
+        The listing pages: the lesson plans index and one page per subject
+    """
+    reads = fixtures.reads
+    start = time.perf_counter()
+    lesson_plan_urls(souschef)
+    return fixtures.reads - reads, 0, time.perf_counter() - start
+
+
+def stage_lesson_plan_to_file(souschef, writer, fixtures):
+    urls = lesson_plan_urls(souschef)
+    start = time.perf_counter()
+    for url, levels in urls:
+        lesson_plan = souschef.build_lesson_plan(url, [levels])
+        if lesson_plan is not None:
+            souschef.commit_unit(lesson_plan)
+    return len(urls), zip_bytes(writer), time.perf_counter() - start
+
+
+def stage_student_resource_to_file(souschef, writer, fixtures):
+    urls = student_resource_urls(souschef)
+    start = time.perf_counter()
+    for url, levels in urls:
+        student_resource = souschef.build_student_resource(url, [levels])
+        if student_resource is not None:
+            souschef.commit_unit(student_resource)
+    return len(urls), zip_bytes(writer), time.perf_counter() - start
+
+
+def stage_web_page_to_file(souschef, writer, fixtures):
+    """
+        The web pages linked from the student resources, zip bytes are the
+        html5 zips since they aren't added to the archive on their own
+    """
+    urls = []
+    for url, levels in student_resource_urls(souschef):
+        try:
+            page = souschef.parse("resource", souschef.downloader.read(url))
+        except requests.exceptions.HTTPError:
+            continue
+        viewmore = souschef.StudentResourceIndex(page).get_viewmore()
+        if isinstance(souschef.ResourceChecker(viewmore).check(), souschef.WebPageSource):
+            urls.append(viewmore)
+    filenames = []
+    start = time.perf_counter()
+    for url in urls:
+        filename = souschef.tmp_filename("web-page", souschef.get_name_from_url(url))
+        souschef.WebPageSource(url).to_file("", filename)
+        filenames.append(filename)
+    seconds = time.perf_counter() - start
+    size = sum(os.path.getsize(filename) for filename in filenames if os.path.isfile(filename))
+    return len(urls), size, seconds
+
+
+STAGES = OrderedDict([
+    ("lesson_plans", stage_lesson_plans),
+    ("LessonPlan.to_file", stage_lesson_plan_to_file),
+    ("StudentResourceIndex.to_file", stage_student_resource_to_file),
+    ("WebPageSource.to_file", stage_web_page_to_file),
+])
+
+
+def run_stage(name, fixtures_dir, queue):
+    """
+        Runs in its own process
+    """
+    disable_network()
+    warnings.filterwarnings("ignore", "Duplicate name")
+    workdir = tempfile.mkdtemp(prefix="edsitement-bench-")
+    try:
+        fixtures = Fixtures(fixtures_dir).load()
+        souschef, writer = setup_chef(workdir, fixtures)
+        pages, size, seconds = STAGES[name](souschef, writer, fixtures)
+        writer.__exit__(None, None, None)
+        queue.put({
+            "pages": pages,
+            "seconds": seconds,
+            "zip_bytes": size,
+            "pages_per_sec": pages / seconds if seconds > 0 else 0,
+            "zip_bytes_per_sec": size / seconds if seconds > 0 else 0,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        })
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def measure(name, fixtures_dir):
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=run_stage, args=(name, fixtures_dir, queue))
+    process.start()
+    while process.is_alive() or not queue.empty():
+        try:
+            return queue.get(timeout=1)
+        except queue_module.Empty:
+            pass
+    raise RuntimeError("stage {} failed with exit code {}".format(name, process.exitcode))
+
+
+# Baselines
+################################################################################
+def regressions(result, baseline, tolerance):
+    """
+        Returns the metrics of result that are worse than baseline by more than tolerance
+    """
+    worse = []
+    for metric in ["pages_per_sec", "zip_bytes_per_sec"]:
+        if baseline.get(metric) and result[metric] < baseline[metric] * (1 - tolerance):
+            worse.append(metric)
+    if baseline.get("peak_rss_mb") and result["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance):
+        worse.append("peak_rss_mb")
+    return worse
+
+
+def change(value, baseline):
+    if not baseline:
+        return ""
+    return "{:+.0f}%".format((value - baseline) * 100.0 / baseline)
+
+
+# Commands
+################################################################################
+def record(args):
+    if os.path.isdir(args.fixtures):
+        shutil.rmtree(args.fixtures)
+    os.makedirs(args.fixtures)
+    fixtures = Fixtures(args.fixtures)
+    workdir = tempfile.mkdtemp(prefix="edsitement-record-")
+    try:
+        souschef, writer = setup_chef(workdir)
+        souschef.use_cache(souschef.FileCache(os.path.join(REPO, ".webcache")))
+        souschef.LOGGER.setLevel(logging.INFO)
+        souschef.LESSON_PLANS_SUBJECT_END = args.subjects
+        souschef.STUDENT_RESOURCE_SUBJECT_END = args.subjects
+        souschef.LESSON_PLANS_END = args.lessons
+        souschef.STUDENT_RESOURCE_END = args.resources
+        fixtures.settings = {name: getattr(souschef, name) for name in SETTINGS}
+        for session in sessions(souschef):
+            for prefix, adapter in list(session.adapters.items()):
+                if not prefix.startswith("file"):
+                    session.mount(prefix, RecordingAdapter(adapter, fixtures))
+        # download_css_js() skips the download when the repo has the assets
+        os.makedirs(ASSETS_DIR)
+        for path, _filename, _directory in souschef.StaticAssets.FILES:
+            if os.path.isfile(os.path.join(REPO, path)):
+                shutil.copy(os.path.join(REPO, path), path)
+        souschef.download_css_js()
+        shutil.copytree(ASSETS_DIR, os.path.join(args.fixtures, ASSETS_DIR))
+        souschef.scrape_source(writer)
+        writer.__exit__(None, None, None)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    fixtures.save()
+    print("Recorded {} responses in {}".format(len(fixtures.responses), args.fixtures))
+
+
+def run(args):
+    if not os.path.isfile(os.path.join(args.fixtures, "index.json")):
+        sys.exit("No fixtures in {}, record them first with: benchmarks/suite.py record".format(args.fixtures))
+    if not os.path.isdir(os.path.join(args.fixtures, ASSETS_DIR)):
+        sys.exit("The fixtures in {} have no {}/, record them again".format(args.fixtures, ASSETS_DIR))
+    baselines = {}
+    if os.path.isfile(args.baselines):
+        with open(args.baselines) as f:
+            baselines = json.load(f)
+
+    for name in args.stages:
+        if name not in STAGES:
+            sys.exit("Unknown stage {}, choose from: {}".format(name, ", ".join(STAGES)))
+    results = OrderedDict()
+    failed = False
+    print("{:30} {:>6} {:>10} {:>14} {:>10}".format("stage", "pages", "pages/s", "zip bytes/s", "peak RSS"))
+    for name in args.stages or STAGES:
+        result = max([measure(name, args.fixtures) for _ in range(args.repeat)],
+            key=lambda result: result["pages_per_sec"])
+        results[name] = result
+        baseline = baselines.get(name, {})
+        worse = regressions(result, baseline, args.tolerance)
+        failed = failed or len(worse) > 0
+        print("{:30} {:6d} {:10.1f} {:14.0f} {:8.1f}MB".format(name, result["pages"],
+            result["pages_per_sec"], result["zip_bytes_per_sec"], result["peak_rss_mb"]))
+        if baseline:
+            print("{:30} {:6} {:>10} {:>14} {:>10}  {}".format("  vs baseline", "",
+                change(result["pages_per_sec"], baseline.get("pages_per_sec")),
+                change(result["zip_bytes_per_sec"], baseline.get("zip_bytes_per_sec")),
+                change(result["peak_rss_mb"], baseline.get("peak_rss_mb")),
+                "REGRESSION: " + ", ".join(worse) if worse else "ok"))
+            if baseline.get("zip_bytes") != result["zip_bytes"]:
+                print("  output size changed: {} -> {} bytes".format(baseline.get("zip_bytes"), result["zip_bytes"]))
+
+    if args.save_baseline:
+        baselines.update(results)
+        with open(args.baselines, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print("Saved baselines to {}".format(args.baselines))
+    sys.exit(1 if failed and not args.save_baseline else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the EDSITEment chef stages.")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Corpus folder (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    record_parser = commands.add_parser("record", help="Record a corpus by running the chef without videos")
+    record_parser.add_argument("--subjects", type=int, default=2,
+        help="Lesson plan and student resource subjects to record (default: %(default)s)")
+    record_parser.add_argument("--lessons", type=int, default=5,
+        help="Lesson plans per subject (default: %(default)s)")
+    record_parser.add_argument("--resources", type=int, default=10,
+        help="Student resources per subject (default: %(default)s)")
+    record_parser.set_defaults(func=record)
+
+    run_parser = commands.add_parser("run", help="Replay the corpus and compare with the baselines")
+    run_parser.add_argument("--baselines", default=BASELINES, help="Baselines file (default: %(default)s)")
+    run_parser.add_argument("--tolerance", type=float, default=0.2,
+        help="Allowed slowdown or RSS growth before a stage is a regression (default: %(default)s)")
+    run_parser.add_argument("--repeat", type=int, default=3,
+        help="Runs of each stage, the fastest one is reported (default: %(default)s)")
+    run_parser.add_argument("--save-baseline", action="store_true",
+        help="Store this run's results as the new baselines")
+    run_parser.add_argument("stages", nargs="*", metavar="stage",
+        help="Stages to run: {} (default: all)".format(", ".join(STAGES)))
+    run_parser.set_defaults(func=run)
+
+    args = parser.parse_args()
+    args.fixtures = os.path.abspath(args.fixtures)  # record runs the chef in its own working directory
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Channel output written as a folder tree instead of a zip.
+
+DirectoryDataWriter writes the DataWriter layout (Channel.csv, Content.csv
+and the channel folder) straight into the folder the line cook reads, so the
+archive doesn't have to be moved and unzipped before running sushichef.py:
+
+    ./souschef.py --output-dir content
+    ./sushichef.py --channeldir=./content/EDSITEment ...
+
+Files the DedupDataWriter stored once are linked back to their other paths
+when the writer is closed.
+"""
+
+import os
+import zipfile
+
+import dedup
+
+
+class DirectoryArchive(object):
+    """
+        The part of zipfile.ZipFile used by the writers and shard.merge(),
+        members are files under directory
+
+        Args:
+            directory (str): folder to read or write, it's created if it's missing
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.names = []
+        os.makedirs(directory, exist_ok=True)
+        for folder, dirnames, filenames in os.walk(directory):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                self.names.append(os.path.relpath(os.path.join(folder, filename), directory).replace(os.sep, "/"))
+
+    def path(self, name):
+        return os.path.join(self.directory, *name.split("/"))
+
+    def writestr(self, name, contents):
+        if isinstance(name, zipfile.ZipInfo):
+            name = name.filename
+        if isinstance(contents, str):
+            contents = contents.encode("utf-8")
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(contents)
+        self.names.append(name)
+
+    def read(self, name):
+        with open(self.path(name), "rb") as f:
+            return f.read()
+
+    def open(self, name, mode="r", force_zip64=False):
+        """
+            File object of member name, "w" creates it
+        """
+        if mode == "r":
+            return open(self.path(name), "rb")
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.names.append(name)
+        return open(path, "wb")
+
+    def getinfo(self, name):
+        info = zipfile.ZipInfo(name)
+        info.file_size = os.path.getsize(self.path(name))
+        return info
+
+    def namelist(self):
+        return list(self.names)
+
+    def close(self):
+        pass
+
+
+class DirectoryDataWriter(dedup.DedupDataWriter):
+    """
+        DedupDataWriter that writes to the folder write_to_path instead of a zip
+    """
+    def open(self):
+        self.zf = DirectoryArchive(self.write_to_path)
+
+    def close(self):
+        super(DirectoryDataWriter, self).close()
+        dedup.restore(self.write_to_path)
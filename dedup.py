@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+Content-addressed storage of the files in the channel archive.
+
+DedupDataWriter stores each distinct file once: when a node's file has the
+same bytes as a file already in the zip, only its path and the path of the
+first copy are written to Duplicates.csv. After unzipping, restore the tree
+(hard links, or copies where links aren't possible) before running the line
+cook:
+
+    python dedup.py restore content/
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import os
+import shutil
+import zipfile
+
+from ricecooker.utils import data_writer
+
+
+MANIFEST = "Duplicates.csv"
+MANIFEST_HEADER = ["Path", "Stored At"]
+CHUNK_SIZE = 1024 * 1024
+
+
+class DedupDataWriter(data_writer.DataWriter):
+    """
+        DataWriter that writes identical file contents to the zip only once
+    """
+    def __init__(self, *args, **kwargs):
+        super(DedupDataWriter, self).__init__(*args, **kwargs)
+        self.stored = {}        # sha256 -> path of the copy in the zip
+        self.digests = {}       # path -> sha256 of its contents
+        self.duplicates = {}    # path -> path of the copy in the zip
+        self.saved_bytes = 0
+
+    def _write_to_zip(self, path, contents):
+        if isinstance(path, list):
+            path = os.path.sep.join(path)
+        data = contents.encode("utf-8") if isinstance(contents, str) else contents
+        self._store(path, hashlib.sha256(data).hexdigest(), len(data),
+            lambda: super(DedupDataWriter, self)._write_to_zip(path, contents))
+
+    def _copy_to_zip(self, path, open_source):
+        """
+            _write_to_zip() of a file copied in chunks, open_source() returns a
+            new file object of it on each call, so it's never fully in memory
+        """
+        digest = hashlib.sha256()
+        size = 0
+        with open_source() as source:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                size += len(chunk)
+
+        def copy():
+            with open_source() as source, self.zf.open(path, "w", force_zip64=size > zipfile.ZIP64_LIMIT) as target:
+                shutil.copyfileobj(source, target, CHUNK_SIZE)
+        self._store(path, digest.hexdigest(), size, copy)
+
+    def _store(self, path, digest, size, write):
+        """
+            Call write() to store the file of size bytes at path, unless a
+            file with the same digest is stored already
+        """
+        stored_at = self.stored.get(digest)
+        if stored_at == path:
+            return
+        previous = self.digests.pop(path, None)
+        if previous is not None and self.stored.get(previous) == path:
+            self.move_copy(path, previous)
+        if stored_at is None:
+            self.stored[digest] = path
+            self.digests[path] = digest
+            self.duplicates.pop(path, None)
+            write()
+        else:
+            self.duplicates[path] = stored_at
+            self.saved_bytes += size
+
+    def add_contents(self, path, title, contents, ext, write_data=True, license=None, copyright_holder=None, **node_data):
+        """
+            add_file() for contents already in memory, like the html5 zips the
+            sous chef streams into the archive, returns the path in the zip
+        """
+        if write_data:
+            assert license, "Files must have a license"
+            copyright_holder = None if not copyright_holder or copyright_holder.strip() == '' else copyright_holder
+            assert license in data_writer.NO_COPYRIGHT_HOLDER_REQUIRED or copyright_holder, \
+                "Licenses must have a copyright holder if they are not public domain"
+        self._parse_path(path)
+        filepath = "{}/{}{}".format(path, title, ext)
+        self._write_to_zip(filepath, contents)
+        if write_data:
+            self._commit(filepath, title, license=license, copyright_holder=copyright_holder, **node_data)
+        return filepath
+
+    def move_copy(self, path, digest):
+        """
+            path is about to be overwritten, store its current contents at one
+            of the duplicates that reference it
+        """
+        del self.stored[digest]
+        dependents = sorted(duplicate for duplicate, stored_at in self.duplicates.items() if stored_at == path)
+        if len(dependents) == 0:
+            return
+        contents = self.zf.read(path)
+        new_path = dependents[0]
+        del self.duplicates[new_path]
+        self.saved_bytes -= len(contents)
+        self.stored[digest] = new_path
+        self.digests[new_path] = digest
+        super(DedupDataWriter, self)._write_to_zip(new_path, contents)
+        for duplicate in dependents[1:]:
+            self.duplicates[duplicate] = new_path
+
+    def close(self):
+        if len(self.duplicates) > 0:
+            manifest = io.StringIO()
+            manifest_writer = csv.writer(manifest)
+            manifest_writer.writerow(MANIFEST_HEADER)
+            for path, stored_at in sorted(self.duplicates.items()):
+                manifest_writer.writerow([path, stored_at])
+            self.zf.writestr(MANIFEST, manifest.getvalue())
+        super(DedupDataWriter, self).close()
+
+    def summary(self):
+        return "Deduplicated {} files, {:.1f}MB saved".format(
+            len(self.duplicates), self.saved_bytes / (1024.0 * 1024))
+
+
+def restore(directory):
+    """
+        Recreate the duplicated files of an unzipped archive from Duplicates.csv,
+        returns the number of files restored
+    """
+    manifest_path = os.path.join(directory, MANIFEST)
+    if not os.path.isfile(manifest_path):
+        return 0
+    with open(manifest_path, newline="") as f:
+        rows = list(csv.reader(f))[1:]
+    for path, stored_at in rows:
+        target = os.path.join(directory, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.lexists(target):
+            os.remove(target)
+        try:
+            os.link(os.path.join(directory, stored_at), target)
+        except OSError:
+            shutil.copyfile(os.path.join(directory, stored_at), target)
+    return len(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Restore the deduplicated files of an unzipped channel archive.")
+    parser.add_argument("command", choices=["restore"])
+    parser.add_argument("directory", help="Folder the archive was unzipped in")
+    args = parser.parse_args()
+    print("Restored {} files".format(restore(args.directory)))
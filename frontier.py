@@ -0,0 +1,121 @@
+"""
+Crawl frontier of the sous chef, with a seen-set of normalized urls.
+
+The same lesson plan can be listed under several subjects and the same
+student resource under several subject listings, and several student
+resources can point to the same web page. The frontier groups the units by
+normalized url, so each page is fetched, parsed and packaged once and its
+result is added at every tree location that lists it, and keeps the
+extracted result of shared pages so they are transformed once. With a
+spool folder the results are pickled there as soon as they are computed
+and only their file is kept in memory, each reuse reads the file again.
+"""
+
+from collections import OrderedDict
+from concurrent.futures import Future
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize(url):
+    """
+        Returns url with a lower case scheme and host, without its default
+        port, fragment and trailing slash, and with sorted query parameters
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    if parts.port is not None and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = "{}:{}".format(netloc, parts.port)
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+class Frontier(object):
+    """
+        Seen-set of the unit pages and results of the shared pages
+
+        Args:
+            spool (str): folder to keep the results in instead of memory, None keeps them in memory
+    """
+    def __init__(self, spool=None):
+        self.seen = set()
+        self.results = {}   # normalized url -> Future, or the file of its result with a spool
+        self.spool = spool
+        self.lock = threading.Lock()
+        self.duplicates = 0
+        self.reused = 0
+
+    def group(self, unit_urls):
+        """
+            Group the (url, levels) pairs by normalized url, returns the
+            (url, [levels, ...]) of each page in the order it's first listed.
+            A url listed twice at the same levels is kept once
+        """
+        pages = OrderedDict()
+        duplicates = 0
+        for url, levels in unit_urls:
+            url, locations = pages.setdefault(normalize(url), (url, []))
+            if len(locations) > 0:
+                duplicates += 1
+            if list(levels) not in locations:
+                locations.append(list(levels))
+        with self.lock:
+            self.seen.update(pages)
+            self.duplicates += duplicates
+        return list(pages.values())
+
+    def once(self, url, compute):
+        """
+            Returns compute(), called once per normalized url, the other
+            callers for the same page wait for and share its result
+        """
+        key = normalize(url)
+        with self.lock:
+            future = self.results.get(key)
+            owner = future is None
+            if owner:
+                future = self.results[key] = Future()
+            else:
+                self.reused += 1
+        if isinstance(future, str):
+            with open(future, "rb") as f:
+                return pickle.load(f)
+        if owner:
+            try:
+                result = compute()
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+                if self.spool is not None:
+                    self.spill(key, result)
+        return future.result()
+
+    def spill(self, key, result):
+        """
+            Keep the result of key in the spool, the callers waiting for it
+            still get it from its future
+        """
+        os.makedirs(self.spool, exist_ok=True)
+        filepath = os.path.join(self.spool, hashlib.sha1(key.encode("utf-8")).hexdigest())
+        with open(filepath, "wb") as f:
+            pickle.dump(result, f, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.results[key] = filepath
+
+    def close(self):
+        if self.spool is not None:
+            shutil.rmtree(self.spool, ignore_errors=True)
+
+    def summary(self):
+        return "Frontier: {} pages, {} duplicate listings, {} shared pages reused".format(
+            len(self.seen), self.duplicates, self.reused)
@@ -0,0 +1,130 @@
+"""
+Recompression of the images the sous chef writes into the html5 zips.
+
+Images are resized to fit in max_dimension pixels and re-encoded with the
+given quality on a pool of processes, the encoding is CPU bound and would
+hold the GIL of the crawl threads. The pool is started with the spawn
+method, forking the multithreaded crawl could copy locks held by other
+threads into the workers. The original bytes are cached on disk by
+url, so a rerun with other settings doesn't download them again, and each
+url is recompressed once per run however many pages show it. The original
+is kept when Pillow can't read it or recompressing doesn't make it smaller.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from urllib.parse import urlparse
+
+from PIL import Image, ImageOps
+
+
+# Formats re-encoded, the file keeps its name (and format) because the pages link it
+FORMATS = ["JPEG", "PNG", "WEBP"]
+
+
+def recompress(data, max_dimension, quality):
+    """
+        Returns data resized to fit in max_dimension x max_dimension and
+        re-encoded, or data itself when that isn't smaller
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (OSError, Image.DecompressionBombError):
+        return data
+    image_format = image.format
+    if image_format not in FORMATS or getattr(image, "is_animated", False):
+        return data
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    output = io.BytesIO()
+    if image_format == "PNG":
+        image.save(output, "PNG", optimize=True)
+    else:
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(output, image_format, quality=quality, optimize=True)
+    recompressed = output.getvalue()
+    return recompressed if len(recompressed) < len(data) else data
+
+
+class ImageOptimizer(object):
+    """
+        Args:
+            read (function): returns the bytes of a url, e.g. downloader.read
+            cache_dir (str): folder of the original images
+            max_dimension (int): max width and height in pixels, None disables the stage
+            quality (int): JPEG and WebP quality, 1-95
+            workers (int): number of processes, None for one per CPU
+    """
+    def __init__(self, read, cache_dir, max_dimension=None, quality=75, workers=None):
+        self.read = read
+        self.cache_dir = cache_dir
+        self.max_dimension = max_dimension
+        self.quality = quality
+        self.workers = workers
+        self.executor = None
+        self.futures = {}
+        self.lock = threading.Lock()
+        self.original_bytes = 0
+        self.optimized_bytes = 0
+
+    def start(self):
+        """
+            Start the process pool, call it from the main thread before the crawl
+        """
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"))
+
+    def original(self, url):
+        """
+            Bytes of url as the site serves them, downloaded once
+        """
+        filename = hashlib.sha1(url.encode("utf-8")).hexdigest() + os.path.splitext(urlparse(url).path)[1]
+        filepath = os.path.join(self.cache_dir, filename)
+        if os.path.isfile(filepath):
+            with open(filepath, "rb") as f:
+                return f.read()
+        data = self.read(url)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(filepath + ".part", "wb") as f:
+            f.write(data)
+        os.replace(filepath + ".part", filepath)
+        return data
+
+    def optimize(self, url):
+        """
+            Recompressed bytes of the image at url, waits for the process pool
+        """
+        with self.lock:
+            self.start()
+            future = self.futures.get(url)
+        if future is None:
+            data = self.original(url)
+            with self.lock:
+                submitted = self.futures.get(url) is None
+                if submitted:
+                    self.futures[url] = self.executor.submit(recompress, data, self.max_dimension, self.quality)
+                future = self.futures[url]
+            if submitted:
+                future.add_done_callback(lambda done: self.count(len(data), done))
+        return future.result()
+
+    def count(self, size, future):
+        if future.exception() is None:
+            with self.lock:
+                self.original_bytes += size
+                self.optimized_bytes += len(future.result())
+
+    def summary(self):
+        return "Recompressed {} images: {:.1f}MB -> {:.1f}MB".format(
+            len(self.futures), self.original_bytes / (1024.0 * 1024), self.optimized_bytes / (1024.0 * 1024))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
@@ -0,0 +1,89 @@
+"""
+On-disk cache of the youtube_dl metadata of the videos linked by the sous chef.
+
+Only the fields the chef reads are kept (the format urls youtube_dl returns
+expire within hours). Entries are appended to a JSONL file, the newest entry
+of a url wins and entries older than the TTL are extracted again.
+"""
+
+import json
+import os
+import threading
+import time
+
+
+INFO_KEYS = ["id", "title", "license", "duration", "uploader", "extractor"]
+
+
+class InfoCache(object):
+    """
+        Args:
+            path (str): JSONL file
+            ttl (float): seconds an entry stays valid, 0 disables the cache
+    """
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self.entries = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.extracted = 0
+
+    def load(self):
+        """
+            Read the valid entries, rewriting the file without the expired
+            and replaced ones
+        """
+        self.entries = {}
+        if not os.path.isfile(self.path):
+            return
+        lines = 0
+        with open(self.path) as f:
+            for line in f:
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self.entries[entry["key"]] = entry
+        now = time.time()
+        self.entries = {key: entry for key, entry in self.entries.items() if entry["time"] + self.ttl > now}
+        if lines > len(self.entries):
+            with open(self.path, "w") as f:
+                for entry in self.entries.values():
+                    f.write(json.dumps(entry) + "\n")
+
+    def get(self, key):
+        """
+            Returns the cached metadata of key, None if it's missing or expired
+        """
+        if self.ttl <= 0:
+            return None
+        with self.lock:
+            if self.entries is None:
+                self.load()
+            entry = self.entries.get(key)
+            if entry is None or entry["time"] + self.ttl <= time.time():
+                return None
+            self.hits += 1
+            return entry["info"]
+
+    def add(self, key, info):
+        """
+            Store the metadata youtube_dl extracted for key, returns the stored fields
+        """
+        info = {name: info.get(name) for name in INFO_KEYS}
+        with self.lock:
+            self.extracted += 1
+            if self.ttl <= 0:
+                return info
+            if self.entries is None:
+                self.load()
+            entry = {"key": key, "time": time.time(), "info": info}
+            self.entries[key] = entry
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        return info
+
+    def summary(self):
+        return "Video metadata: {} from cache, {} extracted".format(self.hits, self.extracted)
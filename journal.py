@@ -0,0 +1,151 @@
+"""
+Completion journal for resumable sous chef runs.
+
+Every lesson plan or student resource that is fully added to the DataWriter
+is appended to a JSONL file with the writer calls it made. A resumed run
+replays those calls instead of fetching and packaging the unit again. Local
+files passed to the writer (lesson zips, videos) are linked into a folder
+next to the journal so they survive /tmp cleanups. Contents streamed to the
+writer aren't kept, units that have them are processed again.
+"""
+
+import json
+import os
+import shutil
+
+
+class Journal(object):
+    """
+        Args:
+            path (str): JSONL file, the files folder is `path` without extension
+    """
+    def __init__(self, path):
+        self.path = path
+        self.files_dir = os.path.splitext(path)[0]
+        self.entries = {}
+        self.calls = None
+        self.file_counter = 0
+
+    def key(self, source, levels):
+        return "/".join([source] + list(levels))
+
+    def load(self):
+        """
+            Read the entries of a previous run, a truncated last line is ignored
+        """
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path) as f:
+            lines = f.read().split("\n")
+        if lines.pop() != "":
+            # drop the line a crash left half written, so new entries start on a new line
+            with open(self.path, "w") as f:
+                f.write("".join(line + "\n" for line in lines))
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            self.entries[self.key(entry["source"], entry["levels"])] = entry
+        self.file_counter = len(os.listdir(self.files_dir)) if os.path.isdir(self.files_dir) else 0
+
+    def reset(self):
+        self.entries = {}
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+        if os.path.isdir(self.files_dir):
+            shutil.rmtree(self.files_dir)
+
+    def get(self, source, levels):
+        """
+            Returns the entry of a finished unit, None if the unit has to be
+            processed again because it's missing or one of its files is gone
+        """
+        entry = self.entries.get(self.key(source, levels))
+        if entry is not None:
+            for call in entry["calls"]:
+                if call["method"] == "add_contents":
+                    return None
+                if call["local"] and not os.path.isfile(call["args"][2]):
+                    return None
+        return entry
+
+    def start(self):
+        self.calls = []
+
+    def keep_file(self, filepath):
+        """
+            Hard link (or copy) a local file into the journal folder
+        """
+        os.makedirs(self.files_dir, exist_ok=True)
+        self.file_counter += 1
+        kept = os.path.join(self.files_dir, "{}-{}".format(self.file_counter, os.path.basename(filepath)))
+        try:
+            os.link(filepath, kept)
+        except OSError:
+            shutil.copyfile(filepath, kept)
+        return kept
+
+    def record(self, method, args, kwargs):
+        if self.calls is None:
+            return
+        args = list(args)
+        local = method == "add_file" and len(args) > 2 and os.path.isfile(args[2])
+        if local:
+            args[2] = self.keep_file(args[2])
+        if method == "add_contents":
+            args[2] = None
+        self.calls.append({"method": method, "args": args, "kwargs": kwargs, "local": local})
+
+    def commit(self, source, levels):
+        """
+            Append the calls recorded since start() as a finished unit
+        """
+        entry = {"source": source, "levels": list(levels), "calls": self.calls}
+        self.calls = None
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries[self.key(source, levels)] = entry
+
+
+class JournalWriter(object):
+    """
+        DataWriter proxy that records add_file/add_folder calls in the journal
+    """
+    def __init__(self, writer, journal):
+        self.writer = writer
+        self.journal = journal
+
+    def __getattr__(self, name):
+        return getattr(self.writer, name)
+
+    def add_file(self, *args, **kwargs):
+        filepath = self.writer.add_file(*args, **kwargs)
+        self.journal.record("add_file", args, kwargs)
+        return filepath
+
+    def add_contents(self, *args, **kwargs):
+        filepath = self.writer.add_contents(*args, **kwargs)
+        self.journal.record("add_contents", args, kwargs)
+        return filepath
+
+    def add_folder(self, *args, **kwargs):
+        self.writer.add_folder(*args, **kwargs)
+        self.journal.record("add_folder", args, kwargs)
+
+
+class JournaledUnit(object):
+    """
+        A unit finished by a previous run, to_file() replays its writer calls
+    """
+    def __init__(self, entry, writer):
+        self.source = entry["source"]
+        self.levels = entry["levels"]
+        self.calls = entry["calls"]
+        self.writer = writer
+
+    def to_file(self):
+        for call in self.calls:
+            getattr(self.writer, call["method"])(*call["args"], **call["kwargs"])
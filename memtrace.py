@@ -0,0 +1,69 @@
+"""
+Peak memory of each lesson plan and student resource, measured with tracemalloc.
+
+While a unit is built or added to the channel tree, the peak of the memory
+traced by tracemalloc is taken above the memory in use when it started, so
+it's what the unit itself allocated. tracemalloc has one peak per process:
+the peaks are exact with one worker, with more they include the units that
+run alongside. Allocations of the --parse-workers processes aren't traced.
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import threading
+import tracemalloc
+
+
+MB = 1024.0 * 1024
+
+
+class MemoryTracker(object):
+    """
+        Tracking is off until start() is called
+    """
+    def __init__(self):
+        self.enabled = False
+        self.units = OrderedDict()  # unit -> peak bytes above the memory in use when it started
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        tracemalloc.start()
+        self.enabled = True
+
+    def stop(self):
+        if self.enabled:
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            self.enabled = False
+
+    @contextmanager
+    def unit(self, url):
+        """
+            Record the peak memory of the block as part of the unit url
+        """
+        if not self.enabled:
+            yield
+            return
+        with self.lock:
+            current, peak = tracemalloc.get_traced_memory()
+            self.peak = max(self.peak, peak)
+            tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            with self.lock:
+                _, peak = tracemalloc.get_traced_memory()
+                self.peak = max(self.peak, peak)
+                self.units[url] = max(self.units.get(url, 0), peak - current)
+
+    def summary(self, top=10):
+        """
+            Returns the peak of the run and a table of the top units by peak memory
+        """
+        with self.lock:
+            units = sorted(self.units.items(), key=lambda item: item[1], reverse=True)[:top]
+            lines = ["Peak traced memory {:.1f}MB, largest units (MB)".format(self.peak / MB)]
+        for unit, peak in units:
+            lines.append("{:8.2f}  {}".format(peak / MB, unit))
+        return "\n".join(lines) + "\n"
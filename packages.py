@@ -0,0 +1,88 @@
+"""
+Storage of the html5 zips the sous chef builds for each lesson and resource.
+
+By default a package is a zip file under /tmp that writer.add_file copies
+into the channel archive, and the file is removed once it's added. With
+stream=True packages are built in memory buffers instead and add() hands
+their bytes to the writer's add_contents(), so each package is written in a
+single pass, straight into the channel output. Inside retained() packages
+are kept after they're added, for units added at several tree locations.
+"""
+
+from contextlib import contextmanager
+import io
+import os
+import threading
+
+from ricecooker.utils import html_writer
+
+
+class PackageStore(object):
+    """
+        Args:
+            stream (bool): keep the packages in memory instead of files
+    """
+    def __init__(self, stream=False):
+        self.stream = stream
+        self.buffers = {}
+        self.lock = threading.Lock()
+        self.retaining = False
+
+    def open(self, filename, mode="w"):
+        """
+            HTMLWriter of the package filename, "a" adds to what it already has
+        """
+        if not self.stream:
+            return html_writer.HTMLWriter(filename, mode)
+        with self.lock:
+            if mode == "w" or filename not in self.buffers:
+                self.buffers[filename] = io.BytesIO()
+            return html_writer.HTMLWriter(self.buffers[filename], mode)
+
+    def exists(self, filename):
+        if not self.stream:
+            return os.path.isfile(filename)
+        with self.lock:
+            return filename in self.buffers
+
+    def size(self, filename):
+        if not self.stream:
+            return os.path.getsize(filename)
+        with self.lock:
+            return len(self.buffers[filename].getbuffer())
+
+    def add(self, writer, path, title, filename, **metadata):
+        """
+            Add the package to the channel as the node title in path, and drop it
+        """
+        if not self.stream:
+            filepath = writer.add_file(path, title, filename, **metadata)
+        else:
+            with self.lock:
+                contents = self.buffers[filename].getvalue()
+            filepath = writer.add_contents(path, title, contents, ext=".zip", **metadata)
+        if not self.retaining:
+            self.discard(filename)
+        return filepath
+
+    @contextmanager
+    def retained(self):
+        """
+            Keep the packages added in the block, they will be added again
+        """
+        self.retaining = True
+        try:
+            yield
+        finally:
+            self.retaining = False
+
+    def discard(self, filename):
+        """
+            Forget a package that won't be added (or already was)
+        """
+        if not self.stream:
+            if os.path.isfile(filename):
+                os.remove(filename)
+        else:
+            with self.lock:
+                self.buffers.pop(filename, None)
@@ -0,0 +1,92 @@
+"""
+Concurrent, deduplicated download of the files the sous chef adds to the
+channel (lesson and student resource PDFs).
+
+Units ask for their files as soon as they find them, while they are built,
+so the downloads overlap with the rest of the crawl; to_file() then gets a
+local path instead of letting writer.add_file download the url inline.
+Each url is downloaded once per run, however many lessons link it.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from urllib.parse import urlparse
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+class Prefetcher(object):
+    """
+        Args:
+            session (requests.Session): session used to download
+            workers (int): number of concurrent downloads
+    """
+    def __init__(self, session, workers=8):
+        self.session = session
+        self.workers = workers
+        self.executor = None
+        self.directory = None
+        self.futures = {}
+        self.lock = threading.Lock()
+        self.requested = 0
+        self.downloaded = 0
+        self.bytes = 0
+
+    def prefetch(self, url):
+        """
+            Start downloading url unless it was already requested
+        """
+        with self.lock:
+            self.requested += 1
+            if url not in self.futures:
+                if self.executor is None:
+                    self.executor = ThreadPoolExecutor(max_workers=self.workers)
+                    self.directory = tempfile.mkdtemp(prefix="edsitement-files-")
+                self.futures[url] = self.executor.submit(self.download, url)
+            return self.futures[url]
+
+    def path(self, url):
+        """
+            Local path of a prefetched url, waits for its download and raises
+            its error (e.g. requests.exceptions.HTTPError). Other urls and local
+            files are returned as they are.
+        """
+        with self.lock:
+            future = self.futures.get(url)
+        if future is None:
+            return url
+        return future.result()
+
+    def download(self, url):
+        # keep the extension, DataWriter takes the file extension from the path
+        filename = hashlib.sha1(url.encode("utf-8")).hexdigest() + os.path.splitext(urlparse(url).path)[1]
+        filepath = os.path.join(self.directory, filename)
+        response = self.session.get(url, stream=True)
+        response.raise_for_status()
+        size = 0
+        with open(filepath + ".part", "wb") as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                f.write(chunk)
+                size += len(chunk)
+        os.rename(filepath + ".part", filepath)
+        with self.lock:
+            self.downloaded += 1
+            self.bytes += size
+        return filepath
+
+    def summary(self):
+        return "Prefetched {} files ({:.1f}MB) for {} requests, {} duplicates skipped".format(
+            self.downloaded, self.bytes / (1024.0 * 1024), self.requested, self.requested - len(self.futures))
+
+    def close(self):
+        """
+            Wait for the pending downloads and delete the downloaded files
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            shutil.rmtree(self.directory, ignore_errors=True)
@@ -5,29 +5,21 @@ ARCHIVE_NAME="EDSITEment"
 
 echo ""
 echo "1. RUNNING SOUCHEF >>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>"
-./souschef.py
-
-if [ ! -f  ${ARCHIVE_NAME}.zip ]; then
-  echo "Cannot find archive ${ARCHIVE_NAME}.zip in current directpry"
-  echo "Please check variable ARCHIVE_NAME is properly set in ./run.sh script"
-fi
-
-
-
-echo ""
-echo "2. UNZIPPING ARCHIVE in content/ dir  >>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>"
+# the channel tree is written straight into content/, no archive to unzip
 if [ ! -d  content ]; then
   mkdir content
 fi
 rm -rf content/*
-mv ${ARCHIVE_NAME}.zip content/
-cd content
-unzip -oq ${ARCHIVE_NAME}.zip
-cd ..
+./souschef.py --output-dir content
+
+if [ ! -d  content/${ARCHIVE_NAME} ]; then
+  echo "Cannot find the channel folder content/${ARCHIVE_NAME}"
+  echo "Please check variable ARCHIVE_NAME is properly set in ./run.sh script"
+fi
 
 
 
 
 echo ""
-echo "3. RUNNING LINECOOK CHEF >>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>"
+echo "2. RUNNING LINECOOK CHEF >>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>>"
 ./sushichef.py -v --reset --channeldir="./content/${ARCHIVE_NAME}" --token=".token"
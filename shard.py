@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""
+Sharded sous chef runs, for building the channel on several machines.
+
+`./souschef.py --shard i/N` only processes the lesson plans and student
+resources whose normalized url hashes to shard i (1 to N), every machine
+crawls the listings and gets the same split. Each shard writes its own
+archive, EDSITEment.shard-i-of-N.zip, and merging them gives the channel
+archive, with the tree in canonical (sorted path) order whatever the
+number of shards:
+
+    python shard.py merge EDSITEment.zip EDSITEment.shard-*.zip
+
+The shards can be zips or the folders of `--output-dir` runs
+(content.shard-i-of-N). The output is a zip, or a folder for the line cook
+when it doesn't end with .zip. Files are copied from the shards in chunks,
+and files with the same contents are stored once (see dedup.py).
+"""
+
+import argparse
+import csv
+import functools
+import hashlib
+import io
+import os
+import zipfile
+
+import channeldir
+import dedup
+import frontier
+
+
+CHANNEL_INFO = "Channel.csv"
+CONTENT_INFO = "Content.csv"
+# Content.csv columns after the path, in the order of the file; merge() passes
+# them to DataWriter._commit() by name
+CONTENT_FIELDS = ["title", "source_id", "description", "author", "language",
+    "license", "license_description", "copyright_holder", "thumbnail"]
+
+
+def parse(spec):
+    """
+        Returns (i, N) of a "i/N" shard spec
+    """
+    try:
+        index, count = [int(part) for part in spec.split("/")]
+    except ValueError:
+        raise ValueError("shard must be i/N, e.g. 1/4, not {}".format(spec))
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError("shard {} isn't one of 1/{count} to {count}/{count}".format(spec, count=count))
+    return index, count
+
+
+def owner(url, count):
+    """
+        The shard (1 to count) that processes the page at url
+    """
+    digest = hashlib.sha1(frontier.normalize(url).encode("utf-8")).hexdigest()
+    return int(digest, 16) % count + 1
+
+
+def archive_path(path, index, count):
+    """
+        Archive of shard index, e.g. EDSITEment.zip -> EDSITEment.shard-1-of-4.zip
+    """
+    root, ext = os.path.splitext(path)
+    return "{}.shard-{}-of-{}{}".format(root, index, count, ext)
+
+
+def open_archive(path):
+    """
+        The zip, or the folder, of a shard
+    """
+    if os.path.isdir(path):
+        return channeldir.DirectoryArchive(path)
+    return zipfile.ZipFile(path)
+
+
+def read_rows(zf, name):
+    return list(csv.reader(io.StringIO(zf.read(name).decode("utf-8"), newline="")))[1:]
+
+
+def canonical(path):
+    return path.split("/")
+
+
+def merge(output, archives):
+    """
+        Merge the shard archives into output, returns the number of nodes.
+        A path in several shards keeps the metadata and file of the last one
+    """
+    channel_info = None
+    nodes = {}      # path -> Content.csv row
+    files = {}      # path -> (archive, member its bytes are stored at)
+    zips = [open_archive(archive) for archive in archives]
+    for archive, zf in zip(archives, zips):
+        info = zf.read(CHANNEL_INFO)
+        if channel_info is not None and info != channel_info:
+            raise ValueError("{} is from another channel".format(archive))
+        channel_info = info
+        for row in read_rows(zf, CONTENT_INFO):
+            nodes[row[0]] = row[1:]
+        names = zf.namelist()
+        for name in names:
+            if name not in [CHANNEL_INFO, CONTENT_INFO, dedup.MANIFEST]:
+                files[name] = (zf, name)
+        if dedup.MANIFEST in names:
+            for path, stored_at in read_rows(zf, dedup.MANIFEST):
+                files[path] = (zf, stored_at)
+
+    if output.endswith(".zip"):
+        writer = dedup.DedupDataWriter(write_to_path=output)
+    else:
+        writer = channeldir.DirectoryDataWriter(write_to_path=output)
+    with writer:
+        writer.zf.writestr(CHANNEL_INFO, channel_info)
+        for path in sorted(files, key=canonical):
+            zf, name = files[path]
+            writer._copy_to_zip(path, functools.partial(zf.open, name))
+        for path in sorted(nodes, key=canonical):
+            writer._commit(path, **dict(zip(CONTENT_FIELDS, nodes[path])))
+    for zf in zips:
+        zf.close()
+    return len(nodes)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Merge the archives of a sharded sous chef run.")
+    parser.add_argument("command", choices=["merge"])
+    parser.add_argument("output", help="Channel archive to write, a folder when it doesn't end with .zip")
+    parser.add_argument("archives", nargs="+", help="Shard archives or folders, e.g. EDSITEment.shard-*.zip")
+    args = parser.parse_args()
+    if os.path.abspath(args.output) in [os.path.abspath(archive) for archive in args.archives]:
+        parser.error("{} is one of the shard archives".format(args.output))
+    if not args.output.endswith(".zip") and os.path.isdir(args.output) and len(os.listdir(args.output)) > 0:
+        parser.error("{} isn't empty".format(args.output))
+    print("Merged {} nodes from {} shards into {}".format(merge(args.output, args.archives), len(args.archives), args.output))
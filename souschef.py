@@ -6,26 +6,49 @@ Edsitement is organized as follow:
 - Finally, each lesson or resource has contents like images, videos, pdfs and html5 files.
 """
 
-from collections import OrderedDict
+import argparse
+import asyncio
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import functools
+import http.client
 import itertools
 import logging
+import multiprocessing
 import os
 from pathlib import Path
 import re
 import sys
+import tempfile
+import threading
 import time
 from urllib.error import URLError
 from urllib.parse import urlparse, urljoin
 
 from bs4 import BeautifulSoup, Tag
 from le_utils.constants import licenses, file_formats
-import pafy
 import requests
+from requests.adapters import HTTPAdapter
 from ricecooker.classes.files import download_from_web, config
-from ricecooker.utils import data_writer, path_builder, downloader, html_writer
+from ricecooker.utils import data_writer, path_builder, downloader
 from ricecooker.utils.caching import CacheForeverHeuristic, FileCache, CacheControlAdapter
 import youtube_dl
 
+import asyncfetch
+import channeldir
+import dedup
+import frontier
+import imageopt
+import infocache
+import journal
+import memtrace
+import packages
+import prefetch
+import shard
+import sqlitecache
+import tracing
+import videoqueue
+
 
 # Run Constants
 ################################################################################
@@ -40,6 +63,10 @@ EDSITEment offers a treasure trove for teachers, students, and parents searching
 CHANNEL_THUMBNAIL = "https://www.neh.gov/files/imagecache/explore_large/explore/images/edsitement.jpg"                                    # Local path or url to image file (optional)
 PATH = path_builder.PathBuilder(channel_name=CHANNEL_NAME)  # Keeps track of path to write to csv
 WRITE_TO_PATH = "{}{}{}.zip".format(os.path.dirname(os.path.realpath(__file__)), os.path.sep, CHANNEL_NAME) # Where to generate zip file
+JOURNAL = journal.Journal("{}.journal.jsonl".format(os.path.splitext(WRITE_TO_PATH)[0])) # Finished lessons and resources
+TRACER = tracing.Tracer() # Per url timing of each stage, enabled with --trace
+FRONTIER = frontier.Frontier() # Seen-set of the pages, each one is processed once
+MEMORY = memtrace.MemoryTracker() # Peak memory of each unit, enabled with --memory-report
 
 
 
@@ -53,6 +80,8 @@ LOGGER.setLevel(logging.INFO)
 
 # BASE_URL is used to identify when a resource is owned by Edsitement
 BASE_URL = "http://edsitement.neh.gov"
+LESSONS_PLANS_URL = urljoin(BASE_URL, "lesson-plans")
+STUDENT_RESOURCES_URL = urljoin(BASE_URL, "student-resources/")
 
 # These constans restrict the number of subjects and student resources when it's
 # doing the scrape
@@ -74,17 +103,218 @@ LESSON_PLANS_END = None
 # for debugging proporses
 DOWNLOAD_VIDEOS = True
 
-# time.sleep for debugging proporses, it helps to check log messages
-TIME_SLEEP = .2
+# (i, N) to process only the lessons and resources of shard i of N, see
+# shard.py, None processes all of them
+SHARD = None
+
+# Requests per second allowed to reach the network for each host group,
+# 0 means unlimited. Responses served from .webcache don't spend tokens
+RATE_LIMITS = {
+    "edsitement": 5,
+    "youtube": 1,
+    "vimeo": 1,
+}
+
+# Number of threads used to fetch and package lessons and student resources,
+# 1 means everything runs serially on the main thread
+WORKERS = 1
+
+# BeautifulSoup backend used to parse the pages of each stage, lxml is the
+# fastest and html5lib the slowest and most lenient
+PARSERS = {
+    "listing": "html.parser",   # subject and student resources listings
+    "lesson": "html5lib",       # lesson plans
+    "resource": "html.parser",  # student resources
+    "webpage": "html.parser",   # WebPageSource pages
+}
+PARSER_BACKENDS = ["html.parser", "lxml", "html5lib"]
+
+# If True, lessons and resources finished by a previous run (see JOURNAL) are
+# replayed from the journal instead of being fetched and packaged again
+RESUME = False
+
+# If True, send conditional requests for the listing, lesson plan and student
+# resource pages even though they are cached forever, and only re-process the
+# pages that changed since the run recorded in JOURNAL
+REVALIDATE = False
+CHANGED_URLS = set()
+
+# "sync" crawls the listing pages with the chef's session, "async" crawls them
+# with asyncfetch and prefetches every lesson and student resource page into
+# the webcache, keeping up to CONNECTIONS requests in flight
+FETCH_ENGINE = "sync"
+CONNECTIONS = 100
+
+# "file" keeps one file per response in .webcache, "sqlite" keeps them in
+# .webcache.sqlite and evicts the least recently used ones above CACHE_MAX_SIZE MB (0 for no limit)
+CACHE_BACKEND = "file"
+CACHE_MAX_SIZE = 0
+
+# Number of concurrent downloads of the lesson and student resource files (PDFs)
+PREFETCH_WORKERS = 8
+
+# Videos are downloaded in the background on VIDEO_WORKERS threads, with at most
+# VIDEO_QUEUE_SIZE videos pending. A failed download is tried VIDEO_RETRIES times
+# waiting a random time up to VIDEO_BACKOFF * 2^try seconds (at most VIDEO_BACKOFF_MAX)
+VIDEO_WORKERS = 2
+VIDEO_QUEUE_SIZE = 8
+VIDEO_RETRIES = 10
+VIDEO_BACKOFF = 0.5
+VIDEO_BACKOFF_MAX = 60
+VIDEO_QUEUE = videoqueue.VideoQueue(workers=VIDEO_WORKERS, max_pending=VIDEO_QUEUE_SIZE)
+
+# Days the youtube_dl metadata (license, title) of a video is reused from
+# .videoinfo.jsonl before it's extracted again, 0 to always extract it
+VIDEO_INFO_TTL = 7
+VIDEO_INFO = infocache.InfoCache(".videoinfo.jsonl", ttl=VIDEO_INFO_TTL * 24 * 3600)
+
+# Images of the lessons and resources are resized to fit in IMAGE_MAX_SIZE pixels
+# (0 keeps them as they are) and re-encoded with IMAGE_QUALITY on IMAGE_WORKERS
+# processes (0 for one per CPU). The originals are cached by url in .imagecache/
+IMAGE_MAX_SIZE = 0
+IMAGE_QUALITY = 75
+IMAGE_WORKERS = 0
+
+# Number of processes that parse and transform the lesson plan, student resource
+# and web pages, 0 parses them on the thread that fetched them. The pages are
+# fetched and the packages written in this process, use it with WORKERS > 1
+PARSE_WORKERS = 0
+PARSE_POOL = None
+PARSE_POOL_LOCK = threading.Lock()
+
+# Folder the channel tree (Channel.csv, Content.csv and the channel folder) is
+# written to, for the line cook to read in place. None writes WRITE_TO_PATH instead
+OUTPUT_DIR = None
+
+# If True the html5 zips of the lessons and resources are built in memory and
+# written once, straight into the channel output, instead of as files in /tmp
+STREAM_PACKAGES = False
+PACKAGES = packages.PackageStore(stream=STREAM_PACKAGES)
+
+# If True the parsed pages are decomposed as soon as what a unit needs was
+# extracted from them, so their memory is freed right away instead of when the
+# garbage collector gets to their reference cycles
+LOW_MEMORY = False
+
+# Gives a unique suffix to the temporary zip files, so two workers never
+# write the same file when a page is listed under several subjects
+TMP_COUNTER = itertools.count()
+
+# rate limiting
+###############################################################
+class TokenBucket(object):
+    """
+        Allows `rate` calls per second with bursts of up to `capacity` calls
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.timestamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """
+            Take a token and return the seconds to wait before using it,
+            the token is reserved before waiting so callers queue up
+        """
+        if not self.rate:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.timestamp) * self.rate)
+            self.timestamp = now
+            wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0
+            self.tokens -= 1
+        return wait
+
+    def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+class HostRateLimiter(object):
+    """
+        Keeps one TokenBucket per host group
+    """
+    HOST_GROUPS = [
+        ("edsitement", ["edsitement.neh.gov"]),
+        ("youtube", ["youtube.com", "youtu.be", "googlevideo.com", "ytimg.com"]),
+        ("vimeo", ["vimeo.com", "vimeocdn.com"]),
+    ]
+
+    def __init__(self, rates):
+        self.buckets = {}
+        self.set_rates(rates)
+
+    def set_rates(self, rates):
+        for group, rate in rates.items():
+            self.buckets[group] = TokenBucket(rate)
+
+    def group(self, url):
+        host = urlparse(url).netloc.split(":")[0]
+        for group, domains in self.HOST_GROUPS:
+            if any(host == domain or host.endswith("."+domain) for domain in domains):
+                return group
+
+    def reserve(self, url):
+        bucket = self.buckets.get(self.group(url))
+        if bucket is not None:
+            return bucket.reserve()
+        return 0
+
+    def acquire(self, url):
+        wait = self.reserve(url)
+        if wait > 0:
+            time.sleep(wait)
+
+
+RATE_LIMITER = HostRateLimiter(RATE_LIMITS)
+
+
+class RateLimitedHTTPAdapter(HTTPAdapter):
+    """
+        HTTPAdapter that waits for a token of the url's host before sending
+    """
+    def send(self, request, *args, **kw):
+        RATE_LIMITER.acquire(request.url)
+        return super(RateLimitedHTTPAdapter, self).send(request, *args, **kw)
+
+
+class RateLimitedCacheControlAdapter(CacheControlAdapter, RateLimitedHTTPAdapter):
+    """
+        CacheControlAdapter answers cache hits itself and only calls the next
+        adapter in the mro (RateLimitedHTTPAdapter) when it has to go to the network
+    """
+    pass
+
 
 # webcache
 ###############################################################
+def use_cache(new_cache):
+    """
+        Mount the cachecontrol adapters of sess on new_cache
+    """
+    global cache, forever_adapter
+    cache = new_cache
+    # every page and file is cached forever, like downloader.read did with DOWNLOAD_SESSION
+    forever_adapter = RateLimitedCacheControlAdapter(heuristic=CacheForeverHeuristic(), cache=cache)
+    sess.mount('http://', forever_adapter)
+    sess.mount('https://', forever_adapter)
+    # ricecooker's session (writer.add_file, HTMLWriter.write_url) caches everything forever in .webcache too
+    ricecooker_adapter = RateLimitedCacheControlAdapter(heuristic=CacheForeverHeuristic(), cache=cache)
+    downloader.DOWNLOAD_SESSION.mount('http://', ricecooker_adapter)
+    downloader.DOWNLOAD_SESSION.mount('https://', ricecooker_adapter)
+
+
 sess = requests.Session()
-cache = FileCache('.webcache')
-basic_adapter = CacheControlAdapter(cache=cache)
-forever_adapter = CacheControlAdapter(heuristic=CacheForeverHeuristic(), cache=cache)
-sess.mount('http://', basic_adapter)
-sess.mount(BASE_URL, forever_adapter)
+use_cache(FileCache('.webcache'))
+PREFETCHER = prefetch.Prefetcher(sess, workers=PREFETCH_WORKERS) # Files linked by the lessons and resources
+IMAGES = imageopt.ImageOptimizer(downloader.read, ".imagecache") # Recompressed images, enabled with --image-max-size
+sess.hooks["response"].append(TRACER.response_hook)
+# writer.add_file and HTMLWriter.write_url read with ricecooker's own session
+downloader.DOWNLOAD_SESSION.hooks["response"].append(TRACER.response_hook)
 
 
 # Main Scraping Method
@@ -94,31 +324,303 @@ def scrape_source(writer):
         Args: writer (DataWriter): class that writes data to folder/spreadsheet structure
         Returns: None
     """
-    scrape_lesson_plans()
-    scrape_student_resources()
+    if FETCH_ENGINE == "async" or REVALIDATE:
+        lesson_plan_urls, student_resource_urls = asyncio.run(crawl_async())
+    else:
+        lesson_plan_urls = lesson_plans(lesson_plans_subject(LESSONS_PLANS_URL))
+        student_resource_urls = student_resources()
+    lesson_plan_pages = [page for page in FRONTIER.group(lesson_plan_urls) if in_shard(page[0])]
+    student_resource_pages = [page for page in FRONTIER.group(student_resource_urls) if in_shard(page[0])]
+    if SHARD is not None:
+        LOGGER.info("Shard {}/{}: {} lesson plans, {} student resources".format(
+            SHARD[0], SHARD[1], len(lesson_plan_pages), len(student_resource_pages)))
+    units = itertools.chain(scrape_lesson_plans(lesson_plan_pages),
+        scrape_student_resources(student_resource_pages))
+    # the units are committed in the order they are listed, whatever the
+    # order their videos finish, so the tree is the same as a serial run's
+    built = deque()
+    for unit in ordered_map(lambda build: build(), units, workers=WORKERS):
+        if unit is not None:
+            built.append(unit)
+        commit_ready(built, pending=VIDEO_QUEUE_SIZE)
+    commit_ready(built)
 
 
 # Helper Methods
 ################################################################################
 
-def scrape_lesson_plans():
+def ordered_map(func, iterable, workers=1):
+    """
+        Apply func to every item on a pool of threads and yield the results
+        in the same order as the items, so the channel tree is built exactly
+        as in a serial run. At most 2 * workers items are in flight.
+    """
+    if workers <= 1:
+        for item in iterable:
+            yield func(item)
+        return
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for item in iterable:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while len(pending) > 0:
+            yield pending.popleft().result()
+
+
+def in_shard(url):
+    """
+        If the page at url is processed by this run, see SHARD
+    """
+    return SHARD is None or shard.owner(url, SHARD[1]) == SHARD[0]
+
+
+def journaled(build, url, locations):
+    """
+        Yield the jobs for a lesson or resource url listed at the levels of
+        each location: one that replays the journal entry of each location
+        finished by a previous run and one that builds the unit for the others
+    """
+    pending = []
+    for levels in locations:
+        entry = finished(url, levels)
+        if entry is not None:
+            yield functools.partial(journal.JournaledUnit, entry, writer)
+        else:
+            pending.append(levels)
+    if len(pending) > 0:
+        yield functools.partial(build, url, pending)
+
+
+def finished(url, levels):
+    """
+        Returns the journal entry of a unit that doesn't need to be processed again
+    """
+    if not RESUME or url in CHANGED_URLS:
+        return None
+    return JOURNAL.get(url, levels)
+
+
+def commit_ready(units, pending=0):
+    """
+        Commit the built units in order from the head of the deque units,
+        until the head is waiting for a video download and at most pending
+        units are queued. The videos behind the head keep downloading
+    """
+    while len(units) > 0:
+        video = getattr(units[0], "video", None)
+        if video is not None and not video.done() and len(units) <= pending:
+            return
+        commit_unit(units.popleft())
+
+
+def commit_unit(unit):
+    """
+        Add a built unit to the channel tree at each of its locations and
+        record them in the journal
+    """
+    with TRACER.unit(unit.source), MEMORY.unit(unit.source):
+        if isinstance(unit, journal.JournaledUnit):
+            unit.to_file()
+            return
+        for levels in unit.locations[:-1]:
+            with PACKAGES.retained():
+                commit_location(unit, levels)
+        commit_location(unit, unit.locations[-1])
+
+
+def commit_location(unit, levels):
+    unit.levels = levels
+    JOURNAL.start()
+    unit.to_file()
+    JOURNAL.commit(unit.source, levels)
+
+
+def fetch(url):
+    """
+        Read url with the chef's session, traced as the fetch stage
+    """
+    with TRACER.span("fetch", url) as event:
+        # downloader.read(url, session=sess) reads with DOWNLOAD_SESSION whatever the session
+        response = sess.get(url)
+        response.raise_for_status()
+        page_contents = response.content
+        event["bytes"] = len(page_contents)
+    return page_contents
+
+
+def parse(stage, page_contents):
+    with TRACER.span("parse") as event:
+        event["bytes"] = len(page_contents)
+        return BeautifulSoup(page_contents, PARSERS[stage])
+
+
+def release(page):
+    """
+        Called when everything needed was extracted from a parsed page, the
+        caller drops its references and with LOW_MEMORY the tree is decomposed
+    """
+    if LOW_MEMORY and page is not None:
+        page.decompose()
+
+
+def offload(func, page_contents, *args):
+    """
+        Run func(page_contents, *args) on the PARSE_WORKERS processes, traced
+        as the parse stage (the transform done by func included)
     """
-        Scrape lesson plans from its urls
+    global PARSE_POOL
+    with PARSE_POOL_LOCK:
+        if PARSE_POOL is None:
+            PARSE_POOL = ProcessPoolExecutor(max_workers=PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=init_parse_worker, initargs=(BASE_URL, PARSERS, LOW_MEMORY, LOGGER.level))
+    with TRACER.span("parse") as event:
+        event["bytes"] = len(page_contents)
+        return PARSE_POOL.submit(func, page_contents, *args).result()
+
+
+def init_parse_worker(base_url, parsers, low_memory, log_level):
+    global BASE_URL, PARSERS, LOW_MEMORY
+    BASE_URL = base_url
+    PARSERS = parsers
+    LOW_MEMORY = low_memory
+    LOGGER.setLevel(log_level)
+
+
+def extract_lesson_plan(page_contents, lesson_filename):
     """
-    LESSONS_PLANS_URL = urljoin(BASE_URL, "lesson-plans")
-    for lesson_plan_url, levels in lesson_plans(lesson_plans_subject(LESSONS_PLANS_URL)):
-        subtopic_name = lesson_plan_url.split("/")[-1]
+        Parse and transform a lesson plan page, returns the parts of its
+        ExtractedLessonPlan. It runs on a parse worker
+    """
+    lesson_plan = LessonPlan(parse("lesson", page_contents), lesson_filename=lesson_filename)
+    lesson_plan.extract()
+    lesson_plan.release()
+    return lesson_plan.parts()
+
+
+def extract_student_resource(page_contents):
+    """
+        Parse and transform a student resource page, returns the parts of
+        its ExtractedStudentResource. It runs on a parse worker
+    """
+    student_resource = StudentResourceIndex(parse("resource", page_contents))
+    student_resource.extract()
+    student_resource.release()
+    return student_resource.parts()
+
+
+def extract_web_page(page_contents, resource_url):
+    """
+        Parse and clean a WebPageSource page, returns its content as html
+        (None for flash pages) and its local pdf files. It runs on a parse worker
+    """
+    page = parse("webpage", page_contents)
+    content, files = WebPageSource(resource_url).extract(page)
+    content = None if content is None else str(content)
+    release(page)
+    return content, files
+
+
+def tmp_filename(prefix, name):
+    return "/tmp/{}-{}-{}.zip".format(prefix, name, next(TMP_COUNTER))
+
+
+async def crawl_async():
+    """
+        Crawl the listing pages with the asyncio engine and prefetch every
+        lesson plan and student resource page into the webcache.
+        Returns the (url, levels) lists of lesson plans and student resources
+    """
+    fetcher = asyncfetch.AsyncFetcher(cache,
+        heuristics={BASE_URL: CacheForeverHeuristic()},
+        limit=CONNECTIONS, rate_limiter=RATE_LIMITER, headers=sess.headers)
+    async with fetcher:
+        LOGGER.info("Scrapping: " + LESSONS_PLANS_URL)
+        if REVALIDATE:
+            await fetcher.revalidate(LESSONS_PLANS_URL)
+        page_contents = await fetcher.fetch(LESSONS_PLANS_URL)
+        subjects = list(itertools.islice(parse_lesson_plans_subject(page_contents),
+            LESSON_PLANS_SUBJECT_INIT, LESSON_PLANS_SUBJECT_END))
+        student_resources_pages = list(student_resources_listing())
+        listing_urls = [url for url, _ in subjects] + student_resources_pages
+        if REVALIDATE:
+            await fetcher.revalidate_all(listing_urls)
+        listing_pages = dict(zip(listing_urls, await fetcher.fetch_all(listing_urls)))
+        for page_contents in listing_pages.values():
+            if isinstance(page_contents, Exception):
+                raise page_contents
+
+        lesson_plan_urls = []
+        for lesson_url, levels in subjects:
+            lesson_plan_urls.extend(parse_lesson_plans(listing_pages[lesson_url], lesson_url, levels))
+        student_resource_urls = []
+        for page_url in student_resources_pages:
+            student_resource_urls.extend((url, ["Student Resources"])
+                for url in parse_student_resources(listing_pages[page_url]))
+
+        unit_urls = [(url, levels) for url, levels in lesson_plan_urls + student_resource_urls if in_shard(url)]
+        if REVALIDATE:
+            await revalidate_units(fetcher, unit_urls)
+        urls = OrderedDict.fromkeys(url for url, levels in unit_urls if finished(url, levels) is None)
+        await fetcher.fetch_all(list(urls))
+        LOGGER.info("Prefetched {} pages: {} from cache, {} from the network".format(
+            len(urls), fetcher.hits, fetcher.misses))
+    return lesson_plan_urls, student_resource_urls
+
+
+async def revalidate_units(fetcher, unit_urls):
+    """
+        Send conditional requests for every lesson plan and student resource
+        page, report the pages that changed and add them to CHANGED_URLS
+    """
+    urls = list(OrderedDict.fromkeys(url for url, _ in unit_urls))
+    results = await fetcher.revalidate_all(urls)
+    for url, changed in zip(urls, results):
+        if isinstance(changed, Exception):
+            LOGGER.info("Error: {}".format(changed))
+        elif changed:
+            LOGGER.info("Changed: " + url)
+            CHANGED_URLS.add(url)
+    LOGGER.info("Revalidated {} pages, {} changed".format(len(urls), len(CHANGED_URLS)))
+
+
+def scrape_lesson_plans(lesson_plan_pages):
+    """
+        Yield the build jobs of each lesson plan page, see FRONTIER.group()
+    """
+    for lesson_plan_url, locations in lesson_plan_pages:
+        yield from journaled(build_lesson_plan, lesson_plan_url, locations)
+
+
+def build_lesson_plan(lesson_plan_url, locations):
+    """
+        Fetch, parse and package a lesson plan once for all the levels it's
+        listed at, returns None if the page can't be read
+    """
+    subtopic_name = lesson_plan_url.split("/")[-1]
+    with TRACER.unit(lesson_plan_url), MEMORY.unit(lesson_plan_url):
         try:
-            page_contents = downloader.read(lesson_plan_url, session=sess)
+            page_contents = fetch(lesson_plan_url)
         except requests.exceptions.HTTPError as e:
             LOGGER.info("Error: {}".format(e))
+            return None
+        lesson_filename = tmp_filename("lesson", subtopic_name)
+        resources_filename = tmp_filename("resources", subtopic_name)
+        if PARSE_WORKERS > 0:
+            lesson_plan = ExtractedLessonPlan(offload(extract_lesson_plan, page_contents, lesson_filename),
+                lesson_filename=lesson_filename, resources_filename=resources_filename)
         else:
-            page = BeautifulSoup(page_contents, 'html5lib')
-            lesson_plan = LessonPlan(page,
-                lesson_filename="/tmp/lesson-"+subtopic_name+".zip",
-                resources_filename="/tmp/resources-"+subtopic_name+".zip")
-            lesson_plan.source = lesson_plan_url
-            lesson_plan.to_file(PATH, levels)
+            page = parse("lesson", page_contents)
+            with TRACER.span("transform"):
+                lesson_plan = LessonPlan(page,
+                    lesson_filename=lesson_filename, resources_filename=resources_filename)
+        lesson_plan.source = lesson_plan_url
+        lesson_plan.locations = locations
+        lesson_plan.build()
+    return lesson_plan
 
 
 def lesson_plans_subject(page_url):
@@ -129,15 +631,27 @@ def lesson_plans_subject(page_url):
         22 -> History & Social Studies
         23 -> Literature & Language Arts
     """
-    page_contents = downloader.read(page_url, session=sess)
+    page_contents = fetch(page_url)
     LOGGER.info("Scrapping: " + page_url)
-    page = BeautifulSoup(page_contents, 'html.parser')
+    for subtopic_url, levels in parse_lesson_plans_subject(page_contents):
+        yield subtopic_url, levels
+
+
+def parse_lesson_plans_subject(page_contents):
+    """
+        Returns the (url, levels) of each subject, the listings are parsed
+        in full so their tree is released before the subjects are crawled
+    """
+    page = parse("listing", page_contents)
     subject_ids = [25, 21, 22, 23]#, 18319, 18373, 25041, 31471]
+    subjects = []
     for node in subject_ids:
         page_h3 = page.find("h3", id="node-"+str(node))
         resource_a = page_h3.find("a", href=True)
         subtopic_url = urljoin(BASE_URL, resource_a["href"].strip())
-        yield subtopic_url, ["Lesson Plans or For Teachers"]
+        subjects.append((subtopic_url, ["Lesson Plans or For Teachers"]))
+    release(page)
+    return subjects
 
 
 def lesson_plans(lesson_plans_subject):
@@ -146,48 +660,118 @@ def lesson_plans(lesson_plans_subject):
     http://edsitement.neh.gov/subject/<subject>
     """
     for lesson_url, levels in itertools.islice(lesson_plans_subject, LESSON_PLANS_SUBJECT_INIT, LESSON_PLANS_SUBJECT_END): #MAX NUMBER OF SUBJECTS
-        page_contents = downloader.read(lesson_url, session=sess)
-        page = BeautifulSoup(page_contents, 'html.parser')
-        sub_lessons = page.find_all("div", class_="lesson-plan-link")
-        title = page.find("h2", class_="subject-area").text
-        LOGGER.info("- Subject:"+title)
-        LOGGER.info("- [url]:"+lesson_url)
-        for seq, sub_lesson in enumerate(itertools.islice(sub_lessons, LESSON_PLANS_INIT, LESSON_PLANS_END)): #MAX NUMBER OF LESSONS
-            resource_a = sub_lesson.find("a", href=True)
-            resource_url = resource_a["href"].strip()
-            LOGGER.info("SEQ ID: {}".format(LESSON_PLANS_INIT+seq))
-            time.sleep(TIME_SLEEP)
-            yield urljoin(BASE_URL, resource_url), levels + [title]
-
-
-def scrape_student_resources():
+        page_contents = fetch(lesson_url)
+        for lesson_plan_url, lesson_levels in parse_lesson_plans(page_contents, lesson_url, levels):
+            yield lesson_plan_url, lesson_levels
+
+
+def parse_lesson_plans(page_contents, lesson_url, levels):
+    page = parse("listing", page_contents)
+    sub_lessons = page.find_all("div", class_="lesson-plan-link")
+    title = page.find("h2", class_="subject-area").text
+    LOGGER.info("- Subject:"+title)
+    LOGGER.info("- [url]:"+lesson_url)
+    lesson_plan_urls = []
+    for seq, sub_lesson in enumerate(itertools.islice(sub_lessons, LESSON_PLANS_INIT, LESSON_PLANS_END)): #MAX NUMBER OF LESSONS
+        resource_a = sub_lesson.find("a", href=True)
+        resource_url = resource_a["href"].strip()
+        LOGGER.info("SEQ ID: {}".format(LESSON_PLANS_INIT+seq))
+        lesson_plan_urls.append((urljoin(BASE_URL, resource_url), levels + [title]))
+    release(page)
+    return lesson_plan_urls
+
+
+def student_resources_listing():
     """
-    Scrape student resources from the main page http://edsitement.neh.gov/student-resources
+    Yield the student resources listing page of each subject
+    http://edsitement.neh.gov/student-resources
     """
-    STUDENT_RESOURCES_URL = urljoin(BASE_URL, "student-resources/")
     subject_ids = [25, 21, 22, 23]
-    levels = ["Student Resources"]
     for subject in subject_ids[STUDENT_RESOURCE_SUBJECT_INIT:STUDENT_RESOURCE_SUBJECT_END]:
         params_url = "all?grade=All&subject={}&type=All".format(subject)
-        page_url = urljoin(STUDENT_RESOURCES_URL, params_url)
+        yield urljoin(STUDENT_RESOURCES_URL, params_url)
+
+
+def student_resources():
+    """
+    Scrape student resources from the listing page of each subject
+    """
+    levels = ["Student Resources"]
+    for page_url in student_resources_listing():
         LOGGER.info("Scrapping: " + page_url)
-        page_contents = downloader.read(page_url, session=sess)
-        page = BeautifulSoup(page_contents, 'html.parser')
-        resource_links = page.find_all(lambda tag: tag.name == "a" and tag.findParent("h3"))
-        for link in resource_links[STUDENT_RESOURCE_INIT:STUDENT_RESOURCE_END]:
-            time.sleep(TIME_SLEEP)
-            if link["href"].rfind("/student-resource/") != -1:
-                student_resource_url = urljoin(BASE_URL, link["href"])
-                try:
-                    page_contents = downloader.read(student_resource_url, session=sess)
-                except requests.exceptions.HTTPError as e:
-                    LOGGER.info("Error: {}".format(e))
-                page = BeautifulSoup(page_contents, 'html.parser')
-                topic_name = student_resource_url.split("/")[-1]
-                student_resource = StudentResourceIndex(page,
-                    filename="/tmp/student-resource-"+topic_name+".zip",
-                    levels=levels)
-                student_resource.to_file()
+        page_contents = fetch(page_url)
+        for student_resource_url in parse_student_resources(page_contents):
+            yield student_resource_url, levels
+
+
+def parse_student_resources(page_contents):
+    page = parse("listing", page_contents)
+    resource_links = page.find_all(lambda tag: tag.name == "a" and tag.findParent("h3"))
+    student_resource_urls = []
+    for link in resource_links[STUDENT_RESOURCE_INIT:STUDENT_RESOURCE_END]:
+        if link["href"].rfind("/student-resource/") != -1:
+            student_resource_urls.append(urljoin(BASE_URL, link["href"]))
+    release(page)
+    return student_resource_urls
+
+
+def scrape_student_resources(student_resource_pages):
+    """
+    Yield the build jobs of each student resource page, see FRONTIER.group()
+    """
+    for student_resource_url, locations in student_resource_pages:
+        yield from journaled(build_student_resource, student_resource_url, locations)
+
+
+def build_student_resource(student_resource_url, locations):
+    """
+        Fetch, parse and package a student resource once for all the levels
+        it's listed at, returns None if the page can't be read
+    """
+    with TRACER.unit(student_resource_url), MEMORY.unit(student_resource_url):
+        try:
+            page_contents = fetch(student_resource_url)
+        except requests.exceptions.HTTPError as e:
+            LOGGER.info("Error: {}".format(e))
+            return None
+        topic_name = student_resource_url.split("/")[-1]
+        filename = tmp_filename("student-resource", topic_name)
+        if PARSE_WORKERS > 0:
+            student_resource = ExtractedStudentResource(offload(extract_student_resource, page_contents),
+                filename=filename, levels=locations[0])
+        else:
+            page = parse("resource", page_contents)
+            student_resource = StudentResourceIndex(page, filename=filename, levels=locations[0])
+        student_resource.source = student_resource_url
+        student_resource.locations = locations
+        student_resource.build()
+    return student_resource
+
+
+def extract_info(ydl, url, formats=False):
+    """
+        youtube_dl metadata of a video url, from VIDEO_INFO when it was
+        extracted less than VIDEO_INFO_TTL days ago. Only the metadata
+        extracted by this call has the "formats" needed to download the
+        video, formats=True skips the cache to get them.
+    """
+    info = None if formats else VIDEO_INFO.get(url)
+    if info is None:
+        RATE_LIMITER.acquire(url)
+        info = ydl.extract_info(url, download=False)
+        VIDEO_INFO.add(url, info)
+    return info
+
+
+def is_network_error(error):
+    """
+        True when error, or the error a youtube_dl DownloadError reports, is
+        a network failure worth another try, False for the errors a retry
+        doesn't fix (unavailable or private videos, missing formats)
+    """
+    if isinstance(error, youtube_dl.utils.DownloadError) and error.exc_info is not None:
+        error = error.exc_info[1]
+    return isinstance(error, (OSError, http.client.HTTPException, youtube_dl.utils.ContentTooShortError))
 
 
 def get_name_from_url(url):
@@ -199,6 +783,16 @@ def get_name_from_url_no_ext(url):
     return ".".join(path.split(".")[:-1])
 
 
+def write_image(zipper, img_url, filename):
+    """
+        Write the image at img_url to the files/ folder of the zip, recompressed
+        when --image-max-size is set
+    """
+    if IMAGES.max_dimension is None:
+        return zipper.write_url(img_url, filename, directory="files")
+    return zipper.write_contents(filename, IMAGES.optimize(img_url), directory="files")
+
+
 def remove_links(content):
     if content is not None:
         for link in content.find_all("a"):
@@ -232,19 +826,114 @@ def if_file_exists(filepath):
     return file_.is_file()
 
 
+class ElementIndex(object):
+    """
+        id and class index of a parsed page, built in one walk of the tree.
+        It has the `find(name, id=..., class_=...)` method of a page, so it can
+        be passed instead of the page to Menu, LessonSection and Resources
+        and every lookup skips the full tree traversal.
+    """
+    def __init__(self, page):
+        self.ids = {}
+        self.classes = {}
+        for tag in page.find_all(True):
+            id_ = tag.get("id")
+            if id_ is not None:
+                self.ids.setdefault(id_, []).append(tag)
+            for class_ in tag.get("class", []):
+                self.classes.setdefault(class_, []).append(tag)
+
+    def find(self, name, id=None, class_=None):
+        if id is not None:
+            tags = self.ids.get(id, [])
+        else:
+            tags = self.classes.get(class_, [])
+        for tag in tags:
+            if tag.name == name and (class_ is None or class_ in tag.get("class", [])):
+                return tag
+
+
+class StaticAssets(object):
+    """
+        Process wide registry of the css/js files shared by every html5 zip,
+        each file is read from disk once. The zip writers keep the first
+        write of a member, so writing the assets twice to a zip is harmless
+    """
+    FILES = [
+        ("chefdata/styles.css", "styles.css", "css/"),
+        ("chefdata/scripts.js", "scripts.js", "js/"),
+    ]
+
+    def __init__(self):
+        self.contents = {}
+        self.lock = threading.Lock()
+
+    def load(self, path):
+        with self.lock:
+            if path not in self.contents:
+                with open(path) as f:
+                    self.contents[path] = f.read()
+            return self.contents[path]
+
+    def write(self, zipper):
+        """
+            Write the assets with zipper
+        """
+        for path, filename, directory in self.FILES:
+            zipper.write_contents(filename, self.load(path), directory=directory)
+
+
+STATIC_ASSETS = StaticAssets()
+
+
+class ZipPackage(object):
+    """
+        Collects the members of an html5 zip in memory and writes the zip
+        in one pass on save(), instead of reopening it for every member.
+        Like HTMLWriter, the first write of a member wins.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.members = OrderedDict()
+
+    def contains(self, filepath):
+        return filepath in self.members
+
+    def write_contents(self, filename, contents, directory="."):
+        filepath = "{}/{}".format(directory, filename)
+        if not self.contains(filepath):
+            self.members[filepath] = (directory, filename, contents)
+        return filepath
+
+    def write_index_contents(self, contents):
+        if not self.contains("index.html"):
+            self.members["index.html"] = (None, "index.html", contents)
+
+    def write_url(self, url, filename, directory="."):
+        return self.write_contents(filename, downloader.read(url), directory=directory)
+
+    def save(self):
+        with PACKAGES.open(self.filename, "w") as zipper:
+            for directory, filename, contents in self.members.values():
+                if directory is None:
+                    zipper.write_index_contents(contents)
+                else:
+                    zipper.write_contents(filename, contents, directory=directory)
+
+
 class Menu(object):
     """
         This class checks elements on the lesson menu and build the menu list
     """
-    def __init__(self, page, filename=None, id_=None):
+    def __init__(self, page, package=None, id_=None):
         self.body = page.find("div", id=id_)
         self.menu = OrderedDict()
-        self.filename = filename
+        self.package = package
+        self.filename = package.filename
         self.menu_titles(self.body.find_all("h4"))
 
     def write(self, content):
-        with html_writer.HTMLWriter(self.filename, "w") as zipper:
-            zipper.write_index_contents(content)
+        self.package.write_index_contents(content)
 
     def to_file(self):
         html = '<html><head><meta charset="utf-8"><link rel="stylesheet" href="css/styles.css"></head><body><div class="main-content-with-sidebar">{}</div><script src="js/scripts.js"></script></body></html>'.format(self.to_html())
@@ -281,12 +970,12 @@ class LessonSection(object):
     """
         Base class for the menu setions
     """
-    def __init__(self, page, filename=None, id_=None, menu_name=None):
+    def __init__(self, page, package=None, id_=None, menu_name=None):
         LOGGER.debug(id_)
         self.body = page.find("div", id=id_)
         if self.body is not None:
             self.title = self.clean_title(self.body.find("h4"))
-        self.filename = filename
+        self.package = package
         self.menu_name = menu_name
 
     def clean_title(self, title):
@@ -301,17 +990,10 @@ class LessonSection(object):
         return "".join([str(p) for p in content])
 
     def write(self, filename, content):
-        with html_writer.HTMLWriter(self.filename, "a") as zipper:
-            zipper.write_contents(filename, content, directory="files")
-
-    def write_css_js(self, filepath):
-        with html_writer.HTMLWriter(filepath, "a") as zipper, open("chefdata/styles.css") as f:
-            content = f.read()
-            zipper.write_contents("styles.css", content, directory="css/")
+        self.package.write_contents(filename, content, directory="files")
 
-        with html_writer.HTMLWriter(filepath, "a") as zipper, open("chefdata/scripts.js") as f:
-            content = f.read()
-            zipper.write_contents("scripts.js", content, directory="js/")
+    def write_css_js(self):
+        STATIC_ASSETS.write(self.package)
 
     def to_file(self, filename, menu_index=None):
         if self.body is not None and filename is not None:
@@ -325,60 +1007,60 @@ class LessonSection(object):
                 html = '<html><head><meta charset="utf-8"><link rel="stylesheet" href="../css/styles.css"></head><body><div class="main-content-with-sidebar">{}</div><script src="../js/scripts.js"></script></body></html>'.format(content)
 
             self.write(filename, html)
-            self.write_css_js(self.filename)
+            self.write_css_js()
 
 
 class Introduction(LessonSection):
-    def __init__(self, page, filename=None):
-        super(Introduction, self).__init__(page, filename=filename,
+    def __init__(self, page, package=None):
+        super(Introduction, self).__init__(page, package=package,
             id_="sect-introduction", menu_name="introduction")
 
 
 class GuidingQuestions(LessonSection):
-    def __init__(self, page, filename=None):
-        super(GuidingQuestions, self).__init__(page, filename=filename,
+    def __init__(self, page, package=None):
+        super(GuidingQuestions, self).__init__(page, package=package,
             id_="sect-questions", menu_name="guiding_questions")
 
 
 class LearningObjetives(LessonSection):
-    def __init__(self, page, filename=None):
-        super(LearningObjetives, self).__init__(page, filename=filename,
+    def __init__(self, page, package=None):
+        super(LearningObjetives, self).__init__(page, package=package,
             id_="sect-objectives", menu_name="learning_objectives")
 
 
 class Background(LessonSection):
-    def __init__(self, page, filename=None):
-        super(Background, self).__init__(page, filename=filename,
+    def __init__(self, page, package=None):
+        super(Background, self).__init__(page, package=package,
             id_="sect-background", menu_name="background")
 
 
 class PreparationInstructions(LessonSection):
-    def __init__(self, page, filename=None):
-        super(PreparationInstructions, self).__init__(page, filename=filename,
+    def __init__(self, page, package=None):
+        super(PreparationInstructions, self).__init__(page, package=package,
             id_="sect-preparation", menu_name="preparation_instructions")
 
 
 class LessonActivities(LessonSection):
-    def __init__(self, page, filename=None):
-        super(LessonActivities, self).__init__(page, filename=filename,
+    def __init__(self, page, package=None):
+        super(LessonActivities, self).__init__(page, package=package,
             id_="sect-activities", menu_name="lesson_activities")
 
 
 class Assessment(LessonSection):
-    def __init__(self, page, filename=None):
-        super(Assessment, self).__init__(page, filename=filename,
+    def __init__(self, page, package=None):
+        super(Assessment, self).__init__(page, package=package,
             id_="sect-assessment", menu_name="assessment")
 
 
 class ExtendingTheLesson(LessonSection):
-    def __init__(self, page, filename=None):
-        super(ExtendingTheLesson, self).__init__(page, filename=filename,
+    def __init__(self, page, package=None):
+        super(ExtendingTheLesson, self).__init__(page, package=package,
             id_="sect-extending", menu_name="extending_the_lesson")
 
 
 class TheBasics(LessonSection):
-    def __init__(self, page, filename=None):
-        super(TheBasics, self).__init__(page, filename=filename,
+    def __init__(self, page, package=None):
+        super(TheBasics, self).__init__(page, package=package,
             id_="sect-thebasics", menu_name="the_basics")
 
     def get_content(self):
@@ -431,11 +1113,11 @@ class Resources(object):
                 yield link["href"]
 
     def write_img(self, img_url, filename):
-        with html_writer.HTMLWriter(self.filename, "a") as zipper:
-            zipper.write_url(img_url, filename, directory="files")
+        with PACKAGES.open(self.filename, "a") as zipper:
+            write_image(zipper, img_url, filename)
 
     def write_index(self, content):
-        with html_writer.HTMLWriter(self.filename, "w") as zipper:
+        with PACKAGES.open(self.filename, "w") as zipper:
             zipper.write_index_contents(content)
 
     def write(self, content, img_url, filename):
@@ -460,8 +1142,10 @@ class LessonPlan(object):
     """
     def __init__(self, page, lesson_filename=None, resources_filename=None):
         self.page = page
-        self.title = self.clean_title(self.page.find("div", id="description"))
-        self.menu = Menu(self.page, filename=lesson_filename, id_="sect-thelesson")
+        self.index = ElementIndex(page)
+        self.title = self.clean_title(self.index.find("div", id="description"))
+        self.package = ZipPackage(lesson_filename)
+        self.menu = Menu(self.index, package=self.package, id_="sect-thelesson")
         self.menu.add("The Basics")
         self.sections = [
             Introduction,
@@ -474,8 +1158,12 @@ class LessonPlan(object):
             ExtendingTheLesson,
             TheBasics
         ]
-        self.resources = Resources(self.page, filename=resources_filename)
+        self.resources = Resources(self.index, filename=resources_filename)
+        self.resources_filename = resources_filename
         self.source = None
+        self.levels = []
+        self.locations = []
+        self.pdfs = []
 
     def clean_title(self, title):
         if title is not None:
@@ -492,15 +1180,60 @@ class LessonPlan(object):
             renamed_pdf_files.append((name, pdf_url))
         return renamed_pdf_files
 
-    def to_file(self, PATH, levels):
+    def build(self):
+        """
+            Write the lesson html5 zip, it's thread safe and can run on a worker
+        """
+        with TRACER.span("transform"):
+            self.extract()
+        self.release()
+        self.package_parts()
+
+    def extract(self):
+        """
+            The parse and transform part of build(), see parts()
+        """
+        self.write_sections()
+        self.pdfs = self.resources.get_pdfs()
+
+    def release(self):
+        """
+            Drop the parsed page after extract(), the lesson only keeps its parts()
+        """
+        release(self.page)
+        self.page = None
+        self.index = None
+        self.menu = None
+        self.resources = None
+
+    def parts(self):
+        """
+            What the lesson needs after extract(): its title, the members of
+            its html5 zip and its pdfs
+        """
+        return {"title": self.title, "members": self.package.members, "pdfs": self.pdfs}
+
+    def package_parts(self):
+        for _, pdf_url in self.pdfs:
+            PREFETCHER.prefetch(pdf_url)
+        with TRACER.span("package") as event:
+            self.package.save()
+            event["bytes"] = PACKAGES.size(self.package.filename)
+
+    def write_sections(self):
         LOGGER.info(" + Lesson:"+ self.title)
         self.menu.to_file()
         for Section in self.sections:
-            section = Section(self.page, filename=self.menu.filename)
+            section = Section(self.index, package=self.package)
             menu_filename = self.menu.get(section.menu_name)
             menu_index = self.menu.to_html(directory="", active_li=menu_filename)
             section.to_file(menu_filename, menu_index=menu_index)
         #self.resources.to_file() download and save images
+
+    def to_file(self):
+        """
+            Add the lesson to the channel tree, must run on the main thread
+        """
         metadata_dict = {"description": "",
             "language": "en",
             "license": licenses.CC_BY,
@@ -508,13 +1241,13 @@ class LessonPlan(object):
             "author": "",
             "source_id": self.source}
 
-        levels.append(self.title)
+        levels = self.levels + [self.title]
         PATH.set(*levels)
-        writer.add_file(str(PATH), "THE LESSON", self.menu.filename, **metadata_dict)
+        PACKAGES.add(writer, str(PATH), "THE LESSON", self.package.filename, **metadata_dict)
         writer.add_folder(str(PATH), "RESOURCES", **metadata_dict)
         PATH.set(*(levels+["RESOURCES"]))
         ##rename pdf files when the lesson have only one file
-        pdfs = self.resources.get_pdfs()
+        pdfs = self.pdfs
         if len(pdfs) == 1:
             pdfs = self.rename_pdfs(pdfs)
 
@@ -522,18 +1255,33 @@ class LessonPlan(object):
             meta = metadata_dict.copy()
             meta["source_id"] = pdf_url
             try:
-                writer.add_file(str(PATH), name.replace(".pdf", ""), pdf_url, **meta)
+                writer.add_file(str(PATH), name.replace(".pdf", ""), PREFETCHER.path(pdf_url), **meta)
             except requests.exceptions.HTTPError as e:
                 LOGGER.info("Error: {}".format(e))
-        if if_file_exists(self.resources.filename):
-            writer.add_file(str(PATH), "MEDIA", self.resources.filename, **metadata_dict)
-            self.rm(self.resources.filename)
+        if PACKAGES.exists(self.resources_filename):
+            PACKAGES.add(writer, str(PATH), "MEDIA", self.resources_filename, **metadata_dict)
         #resource.student_resources() external web page
         PATH.go_to_parent_folder()
         PATH.go_to_parent_folder()
 
-    def rm(self, filepath):
-        os.remove(filepath)
+
+class ExtractedLessonPlan(LessonPlan):
+    """
+        Lesson plan made from the parts() a parse worker extracted,
+        build() only writes its html5 zip
+    """
+    def __init__(self, parts, lesson_filename=None, resources_filename=None):
+        self.title = parts["title"]
+        self.package = ZipPackage(lesson_filename)
+        self.package.members.update(parts["members"])
+        self.pdfs = parts["pdfs"]
+        self.resources_filename = resources_filename
+        self.source = None
+        self.levels = []
+        self.locations = []
+
+    def build(self):
+        self.package_parts()
 
 
 class StudentResourceIndex(object):
@@ -542,6 +1290,17 @@ class StudentResourceIndex(object):
         self.filename = filename
         self.title = None
         self.levels = levels
+        self.locations = []
+        self.source = None
+        self.resource = None
+        self.metadata_dict = None
+        self.video = None
+        self.title_text = None
+        self.description_text = ""
+        self.html = None
+        self.img_url = None
+        self.filename_img = ""
+        self.viewmore = None
 
     def get_img_url(self):
         resource_img = self.body.find("div", class_="image")
@@ -574,11 +1333,11 @@ class StudentResourceIndex(object):
         return "".join(map(str, [self.title, created, self.description]))
 
     def write_img(self, img_url, filename):
-        with html_writer.HTMLWriter(self.filename, "a") as zipper:
-            path = zipper.write_url(img_url, filename, directory="files")
+        with PACKAGES.open(self.filename, "a") as zipper:
+            path = write_image(zipper, img_url, filename)
 
     def write_index(self, content):
-        with html_writer.HTMLWriter(self.filename, "w") as zipper:
+        with PACKAGES.open(self.filename, "w") as zipper:
             zipper.write_index_contents(content)
 
     def write(self, content, img_url, filename):
@@ -586,27 +1345,80 @@ class StudentResourceIndex(object):
         if img_url is not None:
             self.write_img(img_url, filename)
 
-    def to_file(self):
-        img_url = None#self.get_img_url()
-        if img_url is not None:
-            filename_img = get_name_from_url(img_url)
-            img_tag = "<img alt='{img}' src='files/{img}'>".format(img=filename_img)
+    def build(self):
+        """
+            Write the resource html5 zip and fetch the resource it points to,
+            it's thread safe and can run on a worker
+        """
+        with TRACER.span("transform"):
+            self.extract()
+        self.release()
+        self.package_parts()
+
+    def extract(self):
+        """
+            The parse and transform part of build(), see parts()
+        """
+        self.img_url = None#self.get_img_url()
+        if self.img_url is not None:
+            self.filename_img = get_name_from_url(self.img_url)
+            img_tag = "<img alt='{img}' src='files/{img}'>".format(img=self.filename_img)
         else:
             img_tag = ""
-            filename_img = ""
+            self.filename_img = ""
 
         content = self.get_content()
-        html = '<html><head><meta charset="UTF-8"></head><body>{}{}{}</body></html>'.format(
+        self.html = '<html><head><meta charset="UTF-8"></head><body>{}{}{}</body></html>'.format(
             content, img_tag, self.get_credits())
-        self.write(html, img_url, filename_img)
-        resource_checker = ResourceChecker(self.get_viewmore())
-        resource = resource_checker.check()
-        description = "" if self.description is None else self.description.text
-        levels = self.levels + [self.title.text]
-        metadata_dict = resource.to_file(description, self.filename)
+        self.title_text = self.title.text
+        self.description_text = "" if self.description is None else self.description.text
+        self.viewmore = self.get_viewmore()
+
+    def release(self):
+        """
+            Drop the parsed page after extract(), the resource only keeps its parts()
+        """
+        release(self.body)
+        self.body = None
+        self.title = None
+        self.description = None
+
+    def parts(self):
+        """
+            What the resource needs after extract(): its title, description,
+            index html, image and the url of the resource it points to
+        """
+        return {"title": self.title_text, "description": self.description_text, "html": self.html,
+            "img_url": self.img_url, "filename_img": self.filename_img, "viewmore": self.viewmore}
+
+    def package_parts(self):
+        with TRACER.span("package") as event:
+            self.write(self.html, self.img_url, self.filename_img)
+            event["bytes"] = PACKAGES.size(self.filename)
+        resource_checker = ResourceChecker(self.viewmore)
+        self.resource = resource_checker.check()
+        if isinstance(self.resource, (YouTubeResource, VimeoResource)):
+            self.video = VIDEO_QUEUE.submit(self.resource_to_file, self.description_text)
+        else:
+            self.metadata_dict = self.resource.to_file(self.description_text, self.filename)
+
+    def resource_to_file(self, description):
+        with TRACER.unit(self.source):
+            return self.resource.to_file(description, self.filename)
+
+    def to_file(self):
+        """
+            Add the resource to the channel tree, must run on the main thread.
+            Waits for the video download of video resources.
+        """
+        if self.video is not None:
+            self.metadata_dict = self.video.result()
+        resource = self.resource
+        metadata_dict = self.metadata_dict
+        levels = self.levels + [self.title_text]
         if metadata_dict is not None:
             PATH.set(*levels)
-            writer.add_file(str(PATH), "THE LESSON", self.filename, **metadata_dict)
+            PACKAGES.add(writer, str(PATH), "THE LESSON", self.filename, **metadata_dict)
             if resource.resources_files is not None:
                 writer.add_folder(str(PATH), "RESOURCES", **metadata_dict)
                 PATH.set(*(levels+["RESOURCES"]))
@@ -615,13 +1427,33 @@ class StudentResourceIndex(object):
                         meta = file_metadata if len(file_metadata) > 0 else metadata_dict
                         filename = get_name_from_url_no_ext(file_src)
                         if file_src.endswith(".pdf"):
-                            filename = "{}_{}".format(self.title.text, filename)
+                            filename = "{}_{}".format(self.title_text, filename)
                             LOGGER.info("   * " + filename)
-                        writer.add_file(str(PATH), filename, file_src, **meta)
+                        writer.add_file(str(PATH), filename, PREFETCHER.path(file_src), **meta)
                     except requests.exceptions.HTTPError as e:
                         LOGGER.info("Error: {}".format(e))
                 PATH.go_to_parent_folder()
             PATH.go_to_parent_folder()
+        else:
+            PACKAGES.discard(self.filename)
+
+
+class ExtractedStudentResource(StudentResourceIndex):
+    """
+        Student resource made from the parts() a parse worker extracted,
+        build() only writes its html5 zip and fetches its resource
+    """
+    def __init__(self, parts, filename=None, levels=None):
+        super(ExtractedStudentResource, self).__init__(None, filename=filename, levels=levels)
+        self.title_text = parts["title"]
+        self.description_text = parts["description"]
+        self.html = parts["html"]
+        self.img_url = parts["img_url"]
+        self.filename_img = parts["filename_img"]
+        self.viewmore = parts["viewmore"]
+
+    def build(self):
+        self.package_parts()
 
 
 class ResourceChecker(object):
@@ -682,6 +1514,7 @@ class ResourceType(object):
             self.resources_files.append((src, metadata))
         else:
             self.resources_files.append((urljoin(BASE_URL, src), metadata))
+            PREFETCHER.prefetch(urljoin(BASE_URL, src))
 
 
 class FileSource(ResourceType):
@@ -710,12 +1543,12 @@ class ImageSource(ResourceType):
         self.write_img(self.resource_url, filepath, img_filename)
 
     def write_index(self, content, filepath):
-        with html_writer.HTMLWriter(filepath, "w") as zipper:
+        with PACKAGES.open(filepath, "w") as zipper:
             zipper.write_index_contents(content)
 
     def write_img(self, img_url, filepath, img_filename):
-        with html_writer.HTMLWriter(filepath, "a") as zipper:
-            path = zipper.write_url(img_url, img_filename, directory="files")
+        with PACKAGES.open(filepath, "a") as zipper:
+            path = write_image(zipper, img_url, img_filename)
 
     def to_file(self, description, filepath):
         metadata_dict = {"description": description,
@@ -737,21 +1570,14 @@ class WebPageSource(ResourceType):
         self.resource_url = resource_url
 
     def write(self, content, filepath):
-        self.write_index(content, filepath)
+        with PACKAGES.open(filepath, "w") as zipper:
+            zipper.write_index_contents(content)
+            STATIC_ASSETS.write(zipper)
 
     def write_index(self, content, filepath):
-        with html_writer.HTMLWriter(filepath, "w") as zipper:
+        with PACKAGES.open(filepath, "w") as zipper:
             zipper.write_index_contents(content)
 
-    def write_css_js(self, filepath):
-        with html_writer.HTMLWriter(filepath, "a") as zipper, open("chefdata/styles.css") as f:
-            content = f.read()
-            zipper.write_contents("styles.css", content, directory="css/")
-
-        with html_writer.HTMLWriter(filepath, "a") as zipper, open("chefdata/scripts.js") as f:
-            content = f.read()
-            zipper.write_contents("scripts.js", content, directory="js/")
-
     def swf_content(self, content):
         obj = content.find("object")
         if obj is not None and obj["type"] == "application/x-shockwave-flash":
@@ -760,7 +1586,7 @@ class WebPageSource(ResourceType):
 
     def to_file(self, description, filepath):
         try:
-            page_contents = downloader.read(self.resource_url, session=sess)
+            content, files = FRONTIER.once(self.resource_url, self.read)
         except requests.exceptions.HTTPError as e:
             LOGGER.info("Error: {}".format(e))
             return None
@@ -771,23 +1597,48 @@ class WebPageSource(ResourceType):
                 "copyright_holder": "National Endowment for the Humanities",
                 "author": "",
                 "source_id": self.resource_url}
-            page = BeautifulSoup(page_contents, 'html.parser')
-            LOGGER.info("COPYRIGHT {}".format(has_copyright(page)))
-            content = page.find("div", id="content")
-            if self.swf_content(content):
+            if content is None:
                 return
-            files = self.remove_external_links(content)
-            images = self.find_local_images(content)
             for file_ in files:
                 metadata_files = metadata_dict.copy()
                 metadata_files["source_id"] = file_
                 self.add_resources_files(file_, metadata_files)
             #for img in images:
             #    self.add_resources_files(img)
-            self.write('<html><head><meta charset="utf-8"><link rel="stylesheet" href="css/styles.css"></head><body><div class="main-content-with-sidebar">'+str(content)+'</div><script src="js/scripts.js"></script></body></html>', filepath)
-            self.write_css_js(filepath)
+            with TRACER.span("package", self.resource_url) as event:
+                self.write('<html><head><meta charset="utf-8"><link rel="stylesheet" href="css/styles.css"></head><body><div class="main-content-with-sidebar">'+content+'</div><script src="js/scripts.js"></script></body></html>', filepath)
+                event["bytes"] = PACKAGES.size(filepath)
             return metadata_dict
 
+    def read(self):
+        """
+            Fetch, parse and clean the page, returns its content as html
+            (None for flash pages) and its local pdf files. Called once per
+            page by FRONTIER.once(), the resources that point to it share it
+        """
+        page_contents = fetch(self.resource_url)
+        if PARSE_WORKERS > 0:
+            return offload(extract_web_page, page_contents, self.resource_url)
+        page = parse("webpage", page_contents)
+        with TRACER.span("transform", self.resource_url):
+            content, files = self.extract(page)
+            content = None if content is None else str(content)
+        release(page)
+        return content, files
+
+    def extract(self, page):
+        """
+            Returns the cleaned page content and its local pdf files,
+            content is None for flash pages
+        """
+        LOGGER.info("COPYRIGHT {}".format(has_copyright(page)))
+        content = page.find("div", id="content")
+        if self.swf_content(content):
+            return None, []
+        files = self.remove_external_links(content)
+        images = self.find_local_images(content)
+        return content, files
+
     def remove_external_links(self, content):
         files = []
         for link in content.find_all("a"):
@@ -817,23 +1668,29 @@ class YouTubeResource(ResourceType):
 
     def process_file(self, download=False):
         ydl_options = {
-            #'outtmpl': '%(title)s-%(id)s.%(ext)s',
-            #'format': 'bestaudio/best',
+            # the file name (the title of the video) is the title of its node
+            'outtmpl': '/tmp/%(title)s.%(ext)s',
             'writethumbnail': False,
             'no_warnings': True,
             'continuedl': False,
-            'restrictfilenames':True,
+            'restrictfilenames':False,
             'quiet': False,
-            'format': "bestvideo[height<={maxheight}][ext=mp4]+bestaudio[ext=m4a]/best[height<={maxheight}][ext=mp4]".format(maxheight='720'),
+            # a single mp4 file with audio and video, merging formats needs ffmpeg
+            'format': "best[height<={maxheight}][ext=mp4]/best[ext=mp4]".format(maxheight='720'),
         }
 
         with youtube_dl.YoutubeDL(ydl_options) as ydl:
             try:
                 ydl.add_default_info_extractors()
-                info = ydl.extract_info(self.resource_url, download=False)
+                info = extract_info(ydl, self.resource_url)
                 if info["license"] == "Standard YouTube License" or info["license"] is None:
                     if download is True:
-                        filepath = self.video_download()
+                        if "formats" not in info:
+                            info = extract_info(ydl, self.resource_url, formats=True)
+                        with TRACER.span("video", self.resource_url) as event:
+                            filepath = self.video_download(ydl, info)
+                            if filepath is not None and os.path.isfile(filepath):
+                                event["bytes"] = os.path.getsize(filepath)
                     else:
                         filepath = None
 
@@ -844,21 +1701,23 @@ class YouTubeResource(ResourceType):
                     youtube_dl.utils.ExtractorError) as e:
                 LOGGER.info('error_occured ' + str(e))
 
-    #youtubedl has some troubles downloading videos in youtube,
-    #sometimes raises connection error
-    #for that I choose pafy for downloading
-    def video_download(self):
-        for try_number in range(10):
+    def video_download(self, ydl, info):
+        """
+            Download the video from the metadata process_file() extracted,
+            without fetching the video page again
+        """
+        for try_number, delay in videoqueue.backoff(VIDEO_RETRIES, VIDEO_BACKOFF, VIDEO_BACKOFF_MAX):
             try:
-                video = pafy.new(self.resource_url)
-                best = video.getbest(preftype="mp4")
-                filepath = best.download(filepath="/tmp/")
-            except (URLError, ConnectionResetError) as e:
+                RATE_LIMITER.acquire(self.resource_url)
+                result = ydl.process_ie_result(dict(info), download=True)
+            except (youtube_dl.utils.DownloadError, URLError, ConnectionResetError) as e:
+                if not is_network_error(e):
+                    raise
                 LOGGER.info(e)
                 LOGGER.info("Download retry:"+str(try_number))
-                time.sleep(.5)
+                time.sleep(delay)
             else:
-                return filepath
+                return ydl.prepare_filename(result)
 
     def to_file(self, description, filepath):
         metadata_dict = {"description": description,
@@ -891,9 +1750,12 @@ class VimeoResource(ResourceType):
         with youtube_dl.YoutubeDL(ydl_options) as ydl:
             try:
                 ydl.add_default_info_extractors()
-                info = ydl.extract_info(self.resource_url, download=False)
+                info = extract_info(ydl, self.resource_url)
                 if download is True:
-                    filepath = self.video_download(ydl_options)
+                    with TRACER.span("video", self.resource_url) as event:
+                        filepath = self.video_download(ydl_options)
+                        if filepath is not None and os.path.isfile(filepath):
+                            event["bytes"] = os.path.getsize(filepath)
                 else:
                     filepath = None
 
@@ -905,14 +1767,17 @@ class VimeoResource(ResourceType):
                 LOGGER.info('error_occured ' + str(e))
 
     def video_download(self, ydl_options):
-        for try_number in range(10):
+        for try_number, delay in videoqueue.backoff(VIDEO_RETRIES, VIDEO_BACKOFF, VIDEO_BACKOFF_MAX):
             try:
+                RATE_LIMITER.acquire(self.resource_url)
                 filename = download_from_web(self.resource_url, ydl_options,
                     ext=".{}".format(self.file_format))
-            except (URLError, ConnectionResetError) as e:
+            except (youtube_dl.utils.DownloadError, URLError, ConnectionResetError) as e:
+                if not is_network_error(e):
+                    raise
                 LOGGER.info(e)
                 LOGGER.info("Download retry:"+str(try_number))
-                time.sleep(.5)
+                time.sleep(delay)
             except FileNotFoundError as e:
                 LOGGER.info(str(e))
                 return None
@@ -954,9 +1819,125 @@ def download_css_js():
 # CLI: This code will run when the sous chef is called from the command line
 ################################################################################
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Scrape EDSITEment into a folder/csv channel archive.")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+        help="Number of threads that fetch and package lessons and resources (default: %(default)s)")
+    parser.add_argument("--edsitement-rate", type=float, default=RATE_LIMITS["edsitement"],
+        help="Max requests per second to edsitement.neh.gov, 0 for no limit (default: %(default)s)")
+    parser.add_argument("--youtube-rate", type=float, default=RATE_LIMITS["youtube"],
+        help="Max requests per second to YouTube, 0 for no limit (default: %(default)s)")
+    parser.add_argument("--vimeo-rate", type=float, default=RATE_LIMITS["vimeo"],
+        help="Max requests per second to Vimeo, 0 for no limit (default: %(default)s)")
+    parser.add_argument("--fetch-engine", choices=["sync", "async"], default=FETCH_ENGINE,
+        help="async crawls the listings and prefetches every page with asyncio (default: %(default)s)")
+    parser.add_argument("--connections", type=int, default=CONNECTIONS,
+        help="Max open connections of the async fetch engine (default: %(default)s)")
+    for stage in PARSERS:
+        parser.add_argument("--{}-parser".format(stage), choices=PARSER_BACKENDS, default=PARSERS[stage],
+            help="BeautifulSoup backend for {} pages (default: %(default)s)".format(stage))
+    parser.add_argument("--resume", action="store_true",
+        help="Replay the lessons and resources finished by the previous run from its journal")
+    parser.add_argument("--revalidate", action="store_true",
+        help="Revalidate the cached EDSITEment pages and only re-process the ones that changed since the journaled run")
+    parser.add_argument("--cache-backend", choices=["file", "sqlite"], default=CACHE_BACKEND,
+        help="file keeps one file per response in .webcache, sqlite one database in .webcache.sqlite (default: %(default)s)")
+    parser.add_argument("--cache-max-size", type=int, default=CACHE_MAX_SIZE,
+        help="Size cap in MB of the sqlite cache, least recently used responses are evicted, 0 for no limit (default: %(default)s)")
+    parser.add_argument("--prefetch-workers", type=int, default=PREFETCH_WORKERS,
+        help="Number of concurrent downloads of the lesson and resource PDFs (default: %(default)s)")
+    parser.add_argument("--video-workers", type=int, default=VIDEO_WORKERS,
+        help="Number of videos downloaded in the background at the same time (default: %(default)s)")
+    parser.add_argument("--video-info-ttl", type=float, default=VIDEO_INFO_TTL,
+        help="Days the cached youtube_dl metadata of a video is reused, 0 to always extract it (default: %(default)s)")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS,
+        help="Number of processes that parse and transform the pages, 0 parses them on the fetching threads (default: %(default)s)")
+    parser.add_argument("--output-dir", metavar="DIR",
+        help="Write the channel tree to the empty folder DIR instead of {}.zip, for sushichef.py to read in place".format(CHANNEL_NAME))
+    parser.add_argument("--stream-packages", action="store_true",
+        help="Build the html5 zips in memory and write them straight into the channel archive instead of /tmp")
+    parser.add_argument("--image-max-size", type=int, default=IMAGE_MAX_SIZE, metavar="PX",
+        help="Resize the images to fit in PX x PX pixels and re-encode them, 0 keeps them as they are (default: %(default)s)")
+    parser.add_argument("--image-quality", type=int, default=IMAGE_QUALITY,
+        help="JPEG and WebP quality of the recompressed images, 1-95 (default: %(default)s)")
+    parser.add_argument("--image-workers", type=int, default=IMAGE_WORKERS,
+        help="Number of processes recompressing images, 0 for one per CPU (default: %(default)s)")
+    parser.add_argument("--low-memory", action="store_true",
+        help="Decompose the parsed pages as soon as each unit extracted what it needs, "
+             "and keep the shared web pages on disk")
+    parser.add_argument("--memory-report", action="store_true",
+        help="Measure the peak memory of each lesson and resource with tracemalloc and print the largest ones")
+    parser.add_argument("--shard", metavar="i/N",
+        help="Only process the lessons and resources of shard i of N and write them to {}.shard-i-of-N.zip, see shard.py".format(CHANNEL_NAME))
+    parser.add_argument("--trace", metavar="FILE",
+        help="Write the timing of each stage of every url to FILE as JSON lines and print the slowest units")
+    args = parser.parse_args()
+    WORKERS = args.workers
+    REVALIDATE = args.revalidate
+    RESUME = args.resume or args.revalidate
+    for stage in PARSERS:
+        PARSERS[stage] = getattr(args, "{}_parser".format(stage))
+    FETCH_ENGINE = args.fetch_engine
+    PARSE_WORKERS = args.parse_workers
+    OUTPUT_DIR = args.output_dir
+    if args.shard is not None:
+        try:
+            SHARD = shard.parse(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+        WRITE_TO_PATH = shard.archive_path(WRITE_TO_PATH, *SHARD)
+        if OUTPUT_DIR is not None:
+            OUTPUT_DIR = shard.archive_path(OUTPUT_DIR.rstrip("/"), *SHARD)
+        JOURNAL = journal.Journal("{}.journal.jsonl".format(os.path.splitext(WRITE_TO_PATH)[0]))
+    if OUTPUT_DIR is not None and os.path.isdir(OUTPUT_DIR) and len(os.listdir(OUTPUT_DIR)) > 0:
+        parser.error("--output-dir {} isn't empty".format(OUTPUT_DIR))
+    LOW_MEMORY = args.low_memory
+    if LOW_MEMORY:
+        # the shared web pages' results go to disk instead of living for the whole run
+        FRONTIER.spool = tempfile.mkdtemp(prefix="edsitement-frontier-")
+    STREAM_PACKAGES = args.stream_packages
+    PACKAGES.stream = STREAM_PACKAGES
+    PREFETCH_WORKERS = args.prefetch_workers
+    VIDEO_WORKERS = args.video_workers
+    VIDEO_QUEUE.workers = VIDEO_WORKERS
+    VIDEO_INFO_TTL = args.video_info_ttl
+    VIDEO_INFO.ttl = VIDEO_INFO_TTL * 24 * 3600
+    PREFETCHER.workers = PREFETCH_WORKERS
+    IMAGE_MAX_SIZE = args.image_max_size
+    IMAGE_QUALITY = args.image_quality
+    IMAGE_WORKERS = args.image_workers
+    IMAGES.max_dimension = IMAGE_MAX_SIZE if IMAGE_MAX_SIZE > 0 else None
+    IMAGES.quality = IMAGE_QUALITY
+    IMAGES.workers = IMAGE_WORKERS if IMAGE_WORKERS > 0 else None
+    CACHE_BACKEND = args.cache_backend
+    CACHE_MAX_SIZE = args.cache_max_size
+    if CACHE_BACKEND == "sqlite":
+        use_cache(sqlitecache.SQLiteCache('.webcache.sqlite',
+            max_size=CACHE_MAX_SIZE * sqlitecache.MB if CACHE_MAX_SIZE > 0 else None))
+    CONNECTIONS = args.connections
+    RATE_LIMITER.set_rates({
+        "edsitement": args.edsitement_rate,
+        "youtube": args.youtube_rate,
+        "vimeo": args.vimeo_rate,
+    })
+
     download_css_js()
+    if args.trace is not None:
+        TRACER.open(args.trace)
+    if args.memory_report:
+        MEMORY.start()
+    if IMAGES.max_dimension is not None:
+        IMAGES.start()
+    if RESUME:
+        JOURNAL.load()
+    else:
+        JOURNAL.reset()
     # Open a writer to generate files
-    with data_writer.DataWriter(write_to_path=WRITE_TO_PATH) as writer:
+    if OUTPUT_DIR is not None:
+        channel_writer = channeldir.DirectoryDataWriter(write_to_path=OUTPUT_DIR)
+    else:
+        channel_writer = dedup.DedupDataWriter(write_to_path=WRITE_TO_PATH)
+    with channel_writer:
+        writer = journal.JournalWriter(tracing.TracedWriter(channel_writer, TRACER), JOURNAL)
 
         # Write channel details to spreadsheet
         thumbnail = writer.add_file(str(PATH), "Channel Thumbnail", CHANNEL_THUMBNAIL, write_data=False)
@@ -964,5 +1945,26 @@ if __name__ == '__main__':
 
         # Scrape source content
         scrape_source(writer)
-
-        sys.stdout.write("\n\nDONE: Zip created at {}\n".format(writer.write_to_path))
+        if PARSE_POOL is not None:
+            PARSE_POOL.shutdown()
+        VIDEO_QUEUE.close()
+        LOGGER.info(VIDEO_INFO.summary())
+        LOGGER.info(PREFETCHER.summary())
+        PREFETCHER.close()
+        LOGGER.info(FRONTIER.summary())
+        FRONTIER.close()
+        if IMAGES.max_dimension is not None:
+            LOGGER.info(IMAGES.summary())
+            IMAGES.close()
+        LOGGER.info(channel_writer.summary())
+
+        sys.stdout.write("\n\nDONE: {} created at {}\n".format(
+            "Zip" if OUTPUT_DIR is None else "Channel tree", writer.write_to_path))
+        if CACHE_BACKEND == "sqlite":
+            LOGGER.info("Web cache: " + cache.summary())
+        if args.trace is not None:
+            TRACER.close()
+            sys.stdout.write("\n" + TRACER.summary())
+        if args.memory_report:
+            MEMORY.stop()
+            sys.stdout.write("\n" + MEMORY.summary())
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+"""
+Single-file web cache for the cachecontrol adapters of the sous chef.
+
+Responses are stored in one SQLite database instead of one file per response
+(cachecontrol's FileCache). When a size cap is set the least recently used
+entries are evicted. Run this module to see the statistics of a cache or to
+compact it:
+
+    python sqlitecache.py stats .webcache.sqlite
+    python sqlitecache.py compact .webcache.sqlite [--max-size MB]
+"""
+
+import argparse
+import itertools
+import os
+import sqlite3
+import threading
+
+from cachecontrol.cache import BaseCache
+
+
+MB = 1024 * 1024
+
+
+class SQLiteCache(BaseCache):
+    """
+        Args:
+            path (str): database file
+            max_size (int): max bytes of the stored responses, None for no limit
+    """
+    def __init__(self, path, max_size=None):
+        self.path = path
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, used INTEGER NOT NULL)""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses (used)")
+        size, used = self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0), COALESCE(MAX(used), 0) FROM responses").fetchone()
+        self.size = size
+        self.clock = itertools.count(used + 1)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.connection.execute("UPDATE responses SET used = ? WHERE key = ?", (next(self.clock), key))
+            return row[0]
+
+    def set(self, key, value, expires=None):
+        with self.lock:
+            self.transaction(self.insert, key, value)
+
+    def delete(self, key):
+        with self.lock:
+            self.remove(key)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def transaction(self, func, *args):
+        self.connection.execute("BEGIN")
+        try:
+            func(*args)
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            self.size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            raise
+        self.connection.execute("COMMIT")
+
+    def insert(self, key, value):
+        self.remove(key)
+        self.connection.execute("INSERT INTO responses (key, value, size, used) VALUES (?, ?, ?, ?)",
+            (key, sqlite3.Binary(value), len(value), next(self.clock)))
+        self.size += len(value)
+        self.evict()
+
+    def remove(self, key):
+        row = self.connection.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.size -= row[0]
+
+    def evict(self):
+        """
+            Delete the least recently used responses until the cache fits in max_size
+        """
+        if self.max_size is None:
+            return
+        while self.size > self.max_size:
+            rows = self.connection.execute(
+                "SELECT key, size FROM responses ORDER BY used LIMIT 100").fetchall()
+            if len(rows) == 0:
+                break
+            for key, size in rows:
+                if self.size <= self.max_size:
+                    break
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.size -= size
+                self.evictions += 1
+
+    def compact(self):
+        """
+            Evict down to max_size and give the free pages back to the filesystem
+        """
+        with self.lock:
+            self.transaction(self.evict)
+            self.connection.execute("VACUUM")
+            self.connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def stats(self):
+        with self.lock:
+            count = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "entries": count,
+            "size": self.size,
+            "file_size": os.path.getsize(self.path),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def summary(self):
+        stats = self.stats()
+        lookups = stats["hits"] + stats["misses"]
+        return "{} entries, {:.1f}MB in a {:.1f}MB file, {} hits, {} misses ({:.0%} hit rate), {} evicted".format(
+            stats["entries"], stats["size"] / MB, stats["file_size"] / MB, stats["hits"], stats["misses"],
+            stats["hits"] / lookups if lookups > 0 else 0, stats["evictions"])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Inspect or compact a SQLite web cache.")
+    parser.add_argument("command", choices=["stats", "compact"])
+    parser.add_argument("path", help="Cache database, e.g. .webcache.sqlite")
+    parser.add_argument("--max-size", type=int, default=None,
+        help="Size cap in MB, compact evicts the least recently used responses above it")
+    args = parser.parse_args()
+    if not os.path.isfile(args.path):
+        parser.error("{} doesn't exist".format(args.path))
+    cache = SQLiteCache(args.path, max_size=args.max_size * MB if args.max_size else None)
+    if args.command == "compact":
+        before = os.path.getsize(args.path)
+        cache.compact()
+        print("Compacted {}: {:.1f}MB -> {:.1f}MB".format(args.path, before / MB, os.path.getsize(args.path) / MB))
+    print(cache.summary())
+    cache.close()
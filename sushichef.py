@@ -1,9 +1,10 @@
 #!/usr/bin/env python
 import logging
 
-from ricecooker.chefs import LineCook
 from ricecooker.config import LOGGER
 
+from zipcook import ZipLineCook
+
 
 # LOGGING SETTINGS
 ################################################################################
@@ -17,9 +18,10 @@ LOGGER.setLevel(logging.DEBUG)
 # OPEN STAX LINE COOK
 ################################################################################
 
-class EdsitementChef(LineCook):
+class EdsitementChef(ZipLineCook):
     """
-    Sushi chef for uploading the results of the content archive generated by `souschef.py`.
+    Sushi chef for uploading the results of the content archive generated by `souschef.py`,
+    from the unzipped folder (`--channeldir`) or from the zip itself (`--archive`).
     """
     RICECOOKER_JSON_TREE = 'ricecooker_json_tree.json'
     # no custom methods needed: will use generic `LineCook` main and run methods
@@ -0,0 +1,77 @@
+import http.server
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StandInSite(object):
+    """
+        Local stand-in for the EDSITEment server: serves `pages` (path ->
+        body) with an ETag of the body and `headers`, and answers
+        If-None-Match with a 304
+    """
+    def __init__(self):
+        self.pages = {}
+        self.headers = {}
+        self.requests = []
+        site = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                site.requests.append((self.path, self.headers.get("If-None-Match")))
+                body = site.pages.get(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                etag = '"{}"'.format(abs(hash(body)))
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    for name, value in site.headers.items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                for name, value in site.headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def url(self, path):
+        return "http://127.0.0.1:{}{}".format(self.server.server_port, path)
+
+
+@pytest.fixture
+def site():
+    site = StandInSite()
+    site.thread.start()
+    yield site
+    site.server.shutdown()
+    site.server.server_close()
+
+
+@pytest.fixture
+def souschef(tmp_path, monkeypatch):
+    """
+        souschef with its web cache in tmp_path
+    """
+    import souschef
+    from ricecooker.utils.caching import FileCache
+    monkeypatch.chdir(tmp_path)
+    souschef.use_cache(FileCache(str(tmp_path / ".webcache")))
+    yield souschef
+    souschef.use_cache(FileCache(".webcache"))
@@ -0,0 +1,63 @@
+import asyncio
+
+from ricecooker.utils.caching import CacheForeverHeuristic, FileCache
+
+import asyncfetch
+
+
+def run(site, tmp_path, coroutine):
+    async def main():
+        fetcher = asyncfetch.AsyncFetcher(FileCache(str(tmp_path / ".webcache")),
+            heuristics={site.url("/"): CacheForeverHeuristic()})
+        async with fetcher:
+            return await coroutine(fetcher)
+    return asyncio.run(main())
+
+
+def test_fetch_reads_the_cache_the_second_time(site, tmp_path):
+    site.pages["/lesson-plans"] = b"<html>lessons</html>"
+
+    async def fetch_twice(fetcher):
+        first = await fetcher.fetch(site.url("/lesson-plans"))
+        second = await fetcher.fetch(site.url("/lesson-plans"))
+        return first, second, fetcher.hits, fetcher.misses
+
+    assert run(site, tmp_path, fetch_twice) == (b"<html>lessons</html>", b"<html>lessons</html>", 1, 1)
+    assert len(site.requests) == 1
+
+
+def test_fetch_all_returns_the_http_errors(site, tmp_path):
+    site.pages["/a"] = b"a"
+
+    async def fetch_all(fetcher):
+        return await fetcher.fetch_all([site.url("/a"), site.url("/missing")])
+
+    body, error = run(site, tmp_path, fetch_all)
+    assert body == b"a"
+    assert "404" in str(error)
+
+
+def test_revalidate_sends_the_etag_and_reports_changes(site, tmp_path):
+    site.pages["/lesson-plan/l0"] = b"v1"
+
+    async def revalidate(fetcher):
+        await fetcher.fetch(site.url("/lesson-plan/l0"))
+        unchanged = await fetcher.revalidate(site.url("/lesson-plan/l0"))
+        site.pages["/lesson-plan/l0"] = b"v2"
+        changed = await fetcher.revalidate(site.url("/lesson-plan/l0"))
+        return unchanged, changed, await fetcher.fetch(site.url("/lesson-plan/l0"))
+
+    assert run(site, tmp_path, revalidate) == (False, True, b"v2")
+    assert [etag is not None for _, etag in site.requests] == [False, True, True]
+
+
+def test_revalidate_matches_pages_served_with_vary(site, tmp_path):
+    site.headers["Vary"] = "Accept-Encoding"
+    site.pages["/lesson-plan/l0"] = b"v1"
+
+    async def revalidate(fetcher):
+        await fetcher.fetch(site.url("/lesson-plan/l0"))
+        return await fetcher.revalidate(site.url("/lesson-plan/l0"))
+
+    assert run(site, tmp_path, revalidate) is False
+    assert [etag is not None for _, etag in site.requests] == [False, True]
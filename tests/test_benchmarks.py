@@ -0,0 +1,75 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import suite
+
+
+BASE_URL = "http://edsitement.neh.gov"
+SECTIONS = ["introduction", "questions", "objectives", "background",
+            "preparation", "activities", "assessment", "extending"]
+
+
+def lesson_plan(n):
+    sections = "".join('<div id="sect-{0}"><h4>{1}</h4><div class="text"><p>Text {0} {2}'
+        ' <a href="/files/{0}.pdf">pdf</a></p></div></div>'.format(section, section.title(), n) for section in SECTIONS)
+    return ('<html><body><div id="description"><h1>Lesson {n}</h1></div>'
+        '<div id="sect-thelesson"><h4>Introduction</h4><h4>Guiding Questions</h4><h4>Learning Objectives</h4>'
+        '<h4>Background</h4><h4>Preparation Instructions</h4><h4>Lesson Activities</h4><h4>Assessment</h4>'
+        '<h4>Extending The Lesson</h4></div>{sections}<div id="sect-thebasics"><p>Basics {n}</p></div>'
+        '<div id="sect-resources"><a href="/files/handout.pdf">pdf</a></div></body></html>').format(n=n, sections=sections)
+
+
+def student_resource(n):
+    return ('<html><body><div id="description"><h2>Resource {n}</h2><div class="created">2010</div>'
+        '<p>About it</p></div><div class="caption"><div>Website</div><div>Source {n}</div></div>'
+        '<div class="more"><a href="{base}/page/p{n}">more</a></div></body></html>').format(n=n, base=BASE_URL)
+
+
+def web_page(n):
+    return ('<html><body><div id="content"><h1>Page {n}</h1><p>license text</p>'
+        '<a href="/files/doc.pdf">doc</a></div></body></html>').format(n=n)
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """
+        A recorded corpus of one subject with two lesson plans and two student resources
+    """
+    fixtures = suite.Fixtures(str(tmp_path))
+    fixtures.settings = {"LESSON_PLANS_SUBJECT_END": 1, "LESSON_PLANS_END": None,
+        "STUDENT_RESOURCE_SUBJECT_END": 1, "STUDENT_RESOURCE_END": None}
+    html = {"content-type": "text/html"}
+    pages = {
+        "/lesson-plans": "<html><body>{}</body></html>".format("".join(
+            '<h3 id="node-{0}"><a href="/subject/{0}">S</a></h3>'.format(subject) for subject in [25, 21, 22, 23])),
+        "/subject/25": '<html><body><h2 class="subject-area">Art and Culture</h2>'
+            '<div class="lesson-plan-link"><a href="/lesson-plan/l0">L</a></div>'
+            '<div class="lesson-plan-link"><a href="/lesson-plan/l1">L</a></div></body></html>',
+        "/student-resources/all?grade=All&subject=25&type=All": '<html><body>'
+            '<h3><a href="/student-resource/r0">R</a></h3><h3><a href="/student-resource/r1">R</a></h3></body></html>',
+    }
+    for n in range(2):
+        pages["/lesson-plan/l{}".format(n)] = lesson_plan(n)
+        pages["/student-resource/r{}".format(n)] = student_resource(n)
+        pages["/page/p{}".format(n)] = web_page(n)
+    for path, body in pages.items():
+        fixtures.add(BASE_URL + path, 200, html, body.encode("utf-8"))
+    for name in SECTIONS + ["handout", "doc"]:
+        fixtures.add("{}/files/{}.pdf".format(BASE_URL, name), 200, {"content-type": "application/pdf"}, b"%PDF-1.4 " + name.encode())
+    fixtures.save()
+    os.makedirs(str(tmp_path / suite.ASSETS_DIR))
+    (tmp_path / suite.ASSETS_DIR / "styles.css").write_text("body {}")
+    (tmp_path / suite.ASSETS_DIR / "scripts.js").write_text("// js")
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize("stage", list(suite.STAGES))
+def test_every_stage_replays_the_corpus(corpus, stage):
+    result = suite.measure(stage, corpus)
+    assert result["pages"] > 0
+    if stage != "lesson_plans":
+        assert result["zip_bytes"] > 0
@@ -0,0 +1,39 @@
+import os
+import zipfile
+
+from le_utils.constants import licenses
+
+import dedup
+
+
+def write_channel(path, files):
+    with dedup.DedupDataWriter(write_to_path=str(path)) as writer:
+        for folder, title, contents in files:
+            writer.add_contents(folder, title, contents, ext=".pdf",
+                license=licenses.CC_BY, copyright_holder="NEH")
+        return writer.saved_bytes
+
+
+def test_identical_files_are_stored_once_and_restored(tmp_path):
+    saved = write_channel(tmp_path / "c.zip", [
+        ("EDSITEment/A", "handout", b"same"),
+        ("EDSITEment/B", "handout", b"same"),
+        ("EDSITEment/C", "other", b"different"),
+    ])
+    assert saved == 4
+    zf = zipfile.ZipFile(str(tmp_path / "c.zip"))
+    assert "EDSITEment/B/handout.pdf" not in zf.namelist()
+    zf.extractall(str(tmp_path / "out"))
+    assert dedup.restore(str(tmp_path / "out")) == 1
+    with open(os.path.join(str(tmp_path / "out"), "EDSITEment", "B", "handout.pdf"), "rb") as f:
+        assert f.read() == b"same"
+
+
+def test_overwriting_the_stored_copy_keeps_its_duplicates(tmp_path):
+    with dedup.DedupDataWriter(write_to_path=str(tmp_path / "c.zip")) as writer:
+        writer._write_to_zip("EDSITEment/A.pdf", b"same")
+        writer._write_to_zip("EDSITEment/B.pdf", b"same")
+        writer._write_to_zip("EDSITEment/A.pdf", b"new")
+        assert writer.duplicates == {}
+    zf = zipfile.ZipFile(str(tmp_path / "c.zip"))
+    assert zf.read("EDSITEment/B.pdf") == b"same"
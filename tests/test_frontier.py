@@ -0,0 +1,43 @@
+import frontier
+
+
+def test_normalize_ignores_case_port_fragment_slash_and_query_order():
+    assert frontier.normalize("HTTP://EdSITEment.neh.gov:80/Lesson-Plan/x/?b=2&a=1#top") == \
+        "http://edsitement.neh.gov/Lesson-Plan/x?a=1&b=2"
+    assert frontier.normalize("https://edsitement.neh.gov:8443/") == "https://edsitement.neh.gov:8443/"
+    assert frontier.normalize("http://edsitement.neh.gov") == "http://edsitement.neh.gov/"
+
+
+def test_group_keeps_the_first_url_and_each_location_once():
+    pages = frontier.Frontier()
+    grouped = pages.group([
+        ("http://site/l0", ["Subject 25"]),
+        ("http://site/l1", ["Subject 25"]),
+        ("http://SITE/l0/", ["Subject 21"]),
+        ("http://site/l0", ["Subject 25"]),
+    ])
+    assert grouped == [("http://site/l0", [["Subject 25"], ["Subject 21"]]), ("http://site/l1", [["Subject 25"]])]
+    assert pages.duplicates == 2
+
+
+def test_once_computes_a_page_once():
+    pages = frontier.Frontier()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "content"
+
+    assert pages.once("http://site/page/p1", compute) == "content"
+    assert pages.once("http://site/page/p1#more", compute) == "content"
+    assert len(calls) == 1
+    assert pages.reused == 1
+
+
+def test_a_spool_keeps_the_results_on_disk(tmp_path):
+    pages = frontier.Frontier(spool=str(tmp_path / "spool"))
+    assert pages.once("http://site/page/p1", lambda: ("<div>content</div>", ["a.pdf"])) == ("<div>content</div>", ["a.pdf"])
+    assert pages.results == {"http://site/page/p1": str(next((tmp_path / "spool").iterdir()))}
+    assert pages.once("http://site/page/p1", lambda: None) == ("<div>content</div>", ["a.pdf"])
+    pages.close()
+    assert not (tmp_path / "spool").exists()
@@ -0,0 +1,33 @@
+import io
+
+from PIL import Image
+
+import imageopt
+
+
+def jpeg(size):
+    output = io.BytesIO()
+    Image.effect_noise((size, size), 64).convert("RGB").save(output, "JPEG", quality=95)
+    return output.getvalue()
+
+
+def test_images_are_resized_on_spawned_processes(tmp_path):
+    reads = []
+    original = jpeg(400)
+    images = imageopt.ImageOptimizer(lambda url: reads.append(url) or original, str(tmp_path),
+        max_dimension=100, workers=1)
+    images.start()
+    try:
+        assert images.executor._mp_context.get_start_method() == "spawn"
+        optimized = images.optimize("http://edsitement.neh.gov/files/a.jpg")
+        assert images.optimize("http://edsitement.neh.gov/files/a.jpg") == optimized
+    finally:
+        images.close()
+    assert Image.open(io.BytesIO(optimized)).size == (100, 100)
+    assert len(optimized) < len(original)
+    assert reads == ["http://edsitement.neh.gov/files/a.jpg"]
+
+
+def test_unreadable_images_are_kept_as_they_are():
+    data = b"not an image"
+    assert imageopt.recompress(data, 100, 75) is data
@@ -0,0 +1,23 @@
+import infocache
+
+
+def test_entries_expire_after_the_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(infocache.time, "time", lambda: now[0])
+    path = str(tmp_path / "info.jsonl")
+    cache = infocache.InfoCache(path, ttl=60)
+    stored = cache.add("https://youtu.be/x", {"id": "x", "title": "T", "formats": ["expire"]})
+    assert stored == {"id": "x", "title": "T", "license": None, "duration": None, "uploader": None, "extractor": None}
+
+    reloaded = infocache.InfoCache(path, ttl=60)
+    assert reloaded.get("https://youtu.be/x")["title"] == "T"
+    now[0] += 61
+    assert reloaded.get("https://youtu.be/x") is None
+    assert infocache.InfoCache(path, ttl=60).get("https://youtu.be/x") is None
+
+
+def test_a_zero_ttl_disables_the_cache(tmp_path):
+    cache = infocache.InfoCache(str(tmp_path / "info.jsonl"), ttl=0)
+    cache.add("https://youtu.be/x", {"id": "x"})
+    assert cache.get("https://youtu.be/x") is None
+    assert not (tmp_path / "info.jsonl").exists()
@@ -0,0 +1,54 @@
+import journal
+
+
+class RecordingWriter(object):
+    def __init__(self):
+        self.calls = []
+
+    def add_folder(self, *args, **kwargs):
+        self.calls.append(("add_folder", args, kwargs))
+
+    def add_file(self, *args, **kwargs):
+        self.calls.append(("add_file", args, kwargs))
+        return "/".join(args[:2])
+
+
+def test_a_committed_unit_is_replayed_with_its_kept_files(tmp_path):
+    package = tmp_path / "lesson.zip"
+    package.write_bytes(b"zip")
+    path = str(tmp_path / "EDSITEment.journal.jsonl")
+    first_run = journal.Journal(path)
+    writer = journal.JournalWriter(RecordingWriter(), first_run)
+    first_run.start()
+    writer.add_file("EDSITEment/L", "THE LESSON", str(package), license="CC BY")
+    writer.add_folder("EDSITEment/L", "RESOURCES")
+    first_run.commit("http://site/l0", ["Lesson Plans", "L"])
+    package.unlink()
+
+    resumed = journal.Journal(path)
+    resumed.load()
+    assert resumed.get("http://site/l0", ["Lesson Plans"]) is None
+    entry = resumed.get("http://site/l0", ["Lesson Plans", "L"])
+    replayed = RecordingWriter()
+    journal.JournaledUnit(entry, replayed).to_file()
+    assert [call[0] for call in replayed.calls] == ["add_file", "add_folder"]
+    method, args, kwargs = replayed.calls[0]
+    assert open(args[2], "rb").read() == b"zip"
+    assert kwargs == {"license": "CC BY"}
+
+
+def test_a_truncated_last_line_is_dropped(tmp_path):
+    path = tmp_path / "j.jsonl"
+    path.write_text('{"source": "a", "levels": [], "calls": []}\n{"source": "b", "lev')
+    resumed = journal.Journal(str(path))
+    resumed.load()
+    assert resumed.get("a", []) is not None
+    assert path.read_text().endswith("}\n")
+
+
+def test_units_with_streamed_contents_are_processed_again(tmp_path):
+    unit = journal.Journal(str(tmp_path / "j.jsonl"))
+    unit.start()
+    unit.record("add_contents", ["EDSITEment/L", "THE LESSON", b"zip"], {})
+    unit.commit("http://site/l0", [])
+    assert unit.get("http://site/l0", []) is None
@@ -0,0 +1,58 @@
+import csv
+import io
+import zipfile
+
+from le_utils.constants import licenses
+import pytest
+
+import channeldir
+import dedup
+import shard
+
+
+def test_parse():
+    assert shard.parse("2/4") == (2, 4)
+    for spec in ["0/4", "5/4", "x", "1/0"]:
+        with pytest.raises(ValueError):
+            shard.parse(spec)
+
+
+def test_owner_is_deterministic_and_ignores_url_spelling():
+    urls = ["http://edsitement.neh.gov/lesson-plan/l{}".format(n) for n in range(200)]
+    owners = [shard.owner(url, 4) for url in urls]
+    assert owners == [shard.owner(url, 4) for url in urls]
+    assert set(owners) == {1, 2, 3, 4}
+    assert shard.owner("HTTP://EDSITEMENT.neh.gov/lesson-plan/l7/", 4) == owners[7]
+
+
+def test_archive_path():
+    assert shard.archive_path("/x/EDSITEment.zip", 1, 4) == "/x/EDSITEment.shard-1-of-4.zip"
+    assert shard.archive_path("content", 2, 3) == "content.shard-2-of-3"
+
+
+def write_shard(writer, files):
+    with writer:
+        writer.add_channel("EDSITEment", "edsitement", "edsitement.neh.gov", "en", description="EDSITEment")
+        for folder, title, contents in files:
+            writer.add_contents(folder, title, contents, ext=".pdf", license=licenses.CC_BY, copyright_holder="NEH")
+
+
+def test_zip_and_folder_shards_merge_in_canonical_order(tmp_path):
+    write_shard(dedup.DedupDataWriter(write_to_path=str(tmp_path / "c.shard-1-of-2.zip")), [
+        ("EDSITEment/B", "handout", b"same"),
+        ("EDSITEment/B", "other", b"same"),
+    ])
+    write_shard(channeldir.DirectoryDataWriter(write_to_path=str(tmp_path / "c.shard-2-of-2")), [
+        ("EDSITEment/A", "handout", b"same"),
+        ("EDSITEment/A", "lesson", b"lesson"),
+    ])
+    output = str(tmp_path / "c.zip")
+    assert shard.merge(output, [str(tmp_path / "c.shard-1-of-2.zip"), str(tmp_path / "c.shard-2-of-2")]) == 6
+    zf = zipfile.ZipFile(output)
+    rows = list(csv.reader(io.StringIO(zf.read("Content.csv").decode("utf-8"))))[1:]
+    assert [row[0] for row in rows] == ["EDSITEment/A", "EDSITEment/A/handout.pdf", "EDSITEment/A/lesson.pdf",
+        "EDSITEment/B", "EDSITEment/B/handout.pdf", "EDSITEment/B/other.pdf"]
+    assert zf.read("EDSITEment/A/handout.pdf") == b"same"
+    assert "EDSITEment/B/handout.pdf" not in zf.namelist()
+    assert zf.read(dedup.MANIFEST).decode("utf-8").splitlines()[1:] == [
+        "EDSITEment/B/handout.pdf,EDSITEment/A/handout.pdf", "EDSITEment/B/other.pdf,EDSITEment/A/handout.pdf"]
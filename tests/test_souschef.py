@@ -0,0 +1,152 @@
+import asyncio
+import collections
+from concurrent.futures import Future
+import sys
+import time
+from urllib.error import URLError
+
+import pytest
+from ricecooker.utils.caching import CacheForeverHeuristic
+import youtube_dl
+
+import asyncfetch
+
+
+def test_fetch_caches_the_site_pages_forever(souschef, site, tmp_path, monkeypatch):
+    monkeypatch.setattr(souschef, "BASE_URL", site.url(""))
+    souschef.use_cache(souschef.cache)
+    site.pages["/subject/25"] = b"<html>subject</html>"
+    assert souschef.fetch(site.url("/subject/25")) == b"<html>subject</html>"
+    assert souschef.fetch(site.url("/subject/25")) == b"<html>subject</html>"
+    assert len(site.requests) == 1
+
+
+def test_revalidate_units_marks_the_changed_pages(souschef, site, monkeypatch):
+    monkeypatch.setattr(souschef, "CHANGED_URLS", set())
+    site.pages["/lesson-plan/l0"] = b"v1"
+    site.pages["/lesson-plan/l1"] = b"v1"
+    unit_urls = [(site.url("/lesson-plan/l0"), ["Lesson Plans"]), (site.url("/lesson-plan/l1"), ["Lesson Plans"])]
+
+    async def revalidate():
+        fetcher = asyncfetch.AsyncFetcher(souschef.cache, heuristics={site.url("/"): CacheForeverHeuristic()})
+        async with fetcher:
+            await fetcher.fetch_all([url for url, _ in unit_urls])
+            site.pages["/lesson-plan/l1"] = b"v2"
+            await souschef.revalidate_units(fetcher, unit_urls)
+
+    asyncio.run(revalidate())
+    assert souschef.CHANGED_URLS == {site.url("/lesson-plan/l1")}
+
+
+def test_fetch_waits_for_the_rate_limit_of_the_host(souschef, site, monkeypatch):
+    monkeypatch.setattr(souschef.RATE_LIMITER, "HOST_GROUPS", [("edsitement", ["127.0.0.1"])])
+    monkeypatch.setitem(souschef.RATE_LIMITER.buckets, "edsitement", souschef.TokenBucket(10))
+    for n in range(15):
+        site.pages["/page/{}".format(n)] = b"page"
+    start = time.monotonic()
+    for n in range(15):
+        souschef.fetch(site.url("/page/{}".format(n)))
+    # a burst of 10 and 5 more at 10 per second
+    assert time.monotonic() - start >= 0.45
+    assert len(site.requests) == 15
+
+
+def test_ricecooker_downloads_wait_for_the_rate_limit_of_the_host(souschef, site, monkeypatch):
+    from ricecooker.utils import downloader
+    monkeypatch.setattr(souschef.RATE_LIMITER, "HOST_GROUPS", [("edsitement", ["127.0.0.1"])])
+    monkeypatch.setitem(souschef.RATE_LIMITER.buckets, "edsitement", souschef.TokenBucket(10))
+    for n in range(15):
+        site.pages["/file/{}.pdf".format(n)] = b"pdf"
+    start = time.monotonic()
+    for n in range(15):
+        downloader.read(site.url("/file/{}.pdf".format(n)))
+    assert time.monotonic() - start >= 0.45
+    downloader.read(site.url("/file/0.pdf"))
+    assert len(site.requests) == 15
+
+
+class FlakyYoutubeDL(object):
+    def __init__(self, errors):
+        self.errors = errors
+        self.tries = 0
+
+    def process_ie_result(self, info, download=False):
+        self.tries += 1
+        if len(self.errors) > 0:
+            error = self.errors.pop(0)
+            try:
+                raise error
+            except Exception:
+                raise youtube_dl.utils.DownloadError("ERROR: " + str(error), sys.exc_info())
+        return info
+
+    def prepare_filename(self, info):
+        return "/tmp/{}.mp4".format(info["title"])
+
+
+def test_youtube_downloads_are_retried_after_network_errors(souschef, monkeypatch):
+    monkeypatch.setattr(souschef, "VIDEO_BACKOFF", 0)
+    monkeypatch.setitem(souschef.RATE_LIMITER.buckets, "youtube", souschef.TokenBucket(0))
+    ydl = FlakyYoutubeDL([URLError("reset"), ConnectionResetError()])
+    video = souschef.YouTubeResource("https://www.youtube.com/watch?v=x")
+    assert video.video_download(ydl, {"title": "T"}) == "/tmp/T.mp4"
+    assert ydl.tries == 3
+
+
+def test_unavailable_youtube_videos_are_not_retried(souschef, monkeypatch):
+    monkeypatch.setattr(souschef, "VIDEO_BACKOFF", 0)
+    monkeypatch.setitem(souschef.RATE_LIMITER.buckets, "youtube", souschef.TokenBucket(0))
+    ydl = FlakyYoutubeDL([youtube_dl.utils.ExtractorError("This video is private", expected=True)])
+    video = souschef.YouTubeResource("https://www.youtube.com/watch?v=x")
+    with pytest.raises(youtube_dl.utils.DownloadError):
+        video.video_download(ydl, {"title": "T"})
+    assert ydl.tries == 1
+
+
+class BuiltUnit(object):
+    def __init__(self, name, video=None):
+        self.name = name
+        self.video = video
+
+
+def test_units_are_committed_in_order_whatever_the_order_videos_finish(souschef, monkeypatch):
+    committed = []
+    monkeypatch.setattr(souschef, "commit_unit", lambda unit: committed.append(unit.name))
+    video = Future()
+    built = collections.deque([BuiltUnit("lesson"), BuiltUnit("video", video), BuiltUnit("pdf")])
+    souschef.commit_ready(built, pending=2)
+    assert committed == ["lesson"]
+    souschef.commit_ready(built, pending=2)
+    assert committed == ["lesson"]
+    built.append(BuiltUnit("page"))
+    video.set_result({})
+    souschef.commit_ready(built, pending=2)
+    assert committed == ["lesson", "video", "pdf", "page"]
+
+
+def test_the_sync_and_async_fetches_share_pages_served_with_vary(souschef, site, monkeypatch):
+    monkeypatch.setattr(souschef, "BASE_URL", site.url(""))
+    souschef.use_cache(souschef.cache)
+    site.headers["Vary"] = "Accept-Encoding"
+    site.pages["/subject/25"] = b"<html>sync first</html>"
+    site.pages["/subject/21"] = b"<html>async first</html>"
+
+    async def fetch(url):
+        fetcher = asyncfetch.AsyncFetcher(souschef.cache, heuristics={site.url("/"): CacheForeverHeuristic()},
+            headers=souschef.sess.headers)
+        async with fetcher:
+            return await fetcher.fetch(url)
+
+    souschef.fetch(site.url("/subject/25"))
+    assert asyncio.run(fetch(site.url("/subject/25"))) == b"<html>sync first</html>"
+    asyncio.run(fetch(site.url("/subject/21")))
+    assert souschef.fetch(site.url("/subject/21")) == b"<html>async first</html>"
+    assert [path for path, _ in site.requests] == ["/subject/25", "/subject/21"]
+
+
+def test_fetch_caches_every_host_forever(souschef, site):
+    site.pages["/files/other-host.pdf"] = b"pdf"
+    assert souschef.fetch(site.url("/files/other-host.pdf")) == b"pdf"
+    assert souschef.fetch(site.url("/files/other-host.pdf")) == b"pdf"
+    assert len(site.requests) == 1
+    assert souschef.sess.get_adapter("https://www.youtube.com/watch?v=x") is souschef.forever_adapter
@@ -0,0 +1,54 @@
+import zipfile
+
+import dedup
+import zipcook
+
+
+def make_archive(path, compression=zipfile.ZIP_STORED):
+    with zipfile.ZipFile(str(path), "w", compression) as zf:
+        zf.writestr("Channel.csv", "Title\nEDSITEment\n")
+        zf.writestr("EDSITEment/B/b.pdf", b"b" * 5000)
+        zf.writestr("EDSITEment/A/a.pdf", b"a")
+        zf.writestr("EDSITEment/A/Sub/s.pdf", b"s")
+        zf.writestr(dedup.MANIFEST, "Path,Stored At\nEDSITEment/B/copy.pdf,EDSITEment/B/b.pdf\n")
+
+
+def test_members_are_read_from_the_mapping_and_duplicates_from_their_copy(tmp_path):
+    make_archive(tmp_path / "c.zip")
+    archive = zipcook.ZipArchive(str(tmp_path / "c.zip"))
+    assert archive.read("EDSITEment/B/b.pdf") == b"b" * 5000
+    assert archive.read("EDSITEment/B/copy.pdf") == b"b" * 5000
+    assert "EDSITEment/missing.pdf" not in archive
+    archive.close()
+
+
+def test_compressed_members(tmp_path, monkeypatch):
+    monkeypatch.setattr(zipcook, "CHUNK_SIZE", 1000)
+    make_archive(tmp_path / "c.zip", zipfile.ZIP_DEFLATED)
+    archive = zipcook.ZipArchive(str(tmp_path / "c.zip"))
+    assert [len(chunk) for chunk in archive.chunks("EDSITEment/B/b.pdf")] == [1000] * 5
+    archive.close()
+
+
+def test_walk_is_top_down_and_sorted(tmp_path):
+    make_archive(tmp_path / "c.zip")
+    archive = zipcook.ZipArchive(str(tmp_path / "c.zip"))
+    assert list(archive.walk("EDSITEment")) == [
+        ("EDSITEment", ["A", "B"], []),
+        ("EDSITEment/A", ["Sub"], ["a.pdf"]),
+        ("EDSITEment/A/Sub", [], ["s.pdf"]),
+        ("EDSITEment/B", [], ["b.pdf", "copy.pdf"]),
+    ]
+    archive.close()
+
+
+def test_the_adapter_serves_members_to_requests(tmp_path):
+    import requests
+    make_archive(tmp_path / "c.zip")
+    archive = zipcook.ZipArchive(str(tmp_path / "c.zip"))
+    session = requests.Session()
+    session.mount(zipcook.PREFIX, zipcook.ZipMemberAdapter(archive))
+    response = session.get("zip:/EDSITEment/B/copy.pdf", stream=True)
+    assert b"".join(bytes(chunk) for chunk in response) == b"b" * 5000
+    assert session.get("zip:/EDSITEment/nope.pdf").status_code == 404
+    archive.close()
@@ -0,0 +1,129 @@
+"""
+Per-url timing trace of the sous chef stages.
+
+Each traced stage (fetch, parse, transform, package, writer_add, video) writes
+one JSON line with the url it worked on, the lesson plan or student resource
+(unit) it belongs to, its duration, bytes and whether the page came from the
+webcache. At the end of the run summary() lists the slowest units.
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import json
+import threading
+import time
+
+
+STAGES = ["fetch", "parse", "transform", "package", "writer_add", "video"]
+
+
+class Tracer(object):
+    """
+        Args:
+            path (str): JSONL trace file, tracing is off until open() is called
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.file = None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.units = OrderedDict()
+        self.start = time.perf_counter()
+
+    def open(self, path=None):
+        self.path = path or self.path
+        self.file = open(self.path, "w")
+        self.start = time.perf_counter()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    @contextmanager
+    def unit(self, url):
+        """
+            Spans opened in this thread inside the block belong to the unit url
+        """
+        previous = getattr(self.local, "unit", None)
+        self.local.unit = url
+        try:
+            yield
+        finally:
+            self.local.unit = previous
+
+    @contextmanager
+    def span(self, stage, url=None):
+        """
+            Time the block as a stage of the current unit, the block can set
+            the "bytes" and "cache_hit" keys of the yielded event
+        """
+        event = {"bytes": None, "cache_hit": None}
+        if self.file is None:
+            yield event
+            return
+        unit = getattr(self.local, "unit", None) or url
+        self.local.from_cache = None
+        start = time.perf_counter()
+        try:
+            yield event
+        finally:
+            duration = time.perf_counter() - start
+            if event["cache_hit"] is None:
+                event["cache_hit"] = self.local.from_cache
+            event.update({"stage": stage, "url": url or unit, "unit": unit,
+                "start": round(start - self.start, 6), "duration": round(duration, 6)})
+            self.write(event, unit, stage, duration)
+
+    def write(self, event, unit, stage, duration):
+        with self.lock:
+            self.file.write(json.dumps(event, sort_keys=True) + "\n")
+            if unit is None:
+                return
+            stages = self.units.setdefault(unit, OrderedDict.fromkeys(STAGES, 0.0))
+            stages[stage] += duration
+
+    def response_hook(self, response, *args, **kwargs):
+        """
+            requests response hook, records if the response of the current fetch was cached
+        """
+        self.local.from_cache = getattr(response, "from_cache", False)
+
+    def summary(self, top=10):
+        """
+            Returns a table of the top slowest units with their time per stage
+        """
+        with self.lock:
+            units = sorted(self.units.items(), key=lambda item: sum(item[1].values()), reverse=True)[:top]
+        lines = ["Slowest units (seconds)",
+            "{:>8} ".format("total") + " ".join("{:>10}".format(stage) for stage in STAGES) + "  unit"]
+        for unit, stages in units:
+            lines.append("{:8.2f} ".format(sum(stages.values())) +
+                " ".join("{:10.2f}".format(stages[stage]) for stage in STAGES) + "  " + unit)
+        return "\n".join(lines) + "\n"
+
+
+class TracedWriter(object):
+    """
+        DataWriter proxy that traces add_file calls as the writer_add stage
+    """
+    def __init__(self, writer, tracer):
+        self.writer = writer
+        self.tracer = tracer
+
+    def __getattr__(self, name):
+        return getattr(self.writer, name)
+
+    def add_file(self, path, title, download_url, *args, **kwargs):
+        with self.tracer.span("writer_add", download_url) as event:
+            filepath = self.writer.add_file(path, title, download_url, *args, **kwargs)
+            if filepath is not None and hasattr(self.writer, "zf"):
+                # a deduplicated file is only in the zip at the path of its first copy
+                stored_at = getattr(self.writer, "duplicates", {}).get(filepath, filepath)
+                event["bytes"] = self.writer.zf.getinfo(stored_at).file_size
+        return filepath
+
+    def add_contents(self, path, title, contents, *args, **kwargs):
+        with self.tracer.span("writer_add", path) as event:
+            event["bytes"] = len(contents)
+            return self.writer.add_contents(path, title, contents, *args, **kwargs)
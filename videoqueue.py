@@ -0,0 +1,55 @@
+"""
+Background queue for the video downloads of the sous chef.
+
+Video resources are downloaded on a few dedicated threads while the crawl
+keeps fetching and packaging pages. At most `max_pending` videos are queued
+or downloading; submitting another one waits for a free slot, so a backlog
+of slow videos can't pile up without bound.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import random
+import threading
+
+
+class VideoQueue(object):
+    """
+        Args:
+            workers (int): number of concurrent downloads
+            max_pending (int): max number of videos queued or downloading
+    """
+    def __init__(self, workers=2, max_pending=8):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor = None
+        self.slots = None
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args):
+        """
+            Run func(*args) in the background, returns its Future
+        """
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers)
+                self.slots = threading.BoundedSemaphore(max(self.max_pending, self.workers))
+        self.slots.acquire()
+        future = self.executor.submit(func, *args)
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def close(self):
+        """
+            Wait for the pending downloads
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+
+def backoff(tries, base, cap):
+    """
+        Yield (try_number, delay) for each try, the delay to wait after a
+        failed try is random between 0 and base * 2 ** try_number, at most cap
+    """
+    for try_number in range(tries):
+        yield try_number, random.uniform(0, min(cap, base * 2 ** try_number))
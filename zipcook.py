@@ -0,0 +1,270 @@
+"""
+LineCook that reads the channel archive written by souschef.py in place.
+
+ZipLineCook takes `--archive EDSITEment.zip` instead of `--channeldir`: the
+metadata is read from the archive's Channel.csv and Content.csv and the
+channel tree is built from its member list instead of walking a folder.
+Content files are given to ricecooker as `zip:/<path in the archive>`
+paths, which a requests adapter mounted on ricecooker's download session
+serves straight from the archive, so ricecooker hashes and stores them
+without the archive being unzipped first. The archive is memory-mapped and
+its stored (uncompressed) members are read as slices of the mapping.
+Files deduplicated by dedup.DedupDataWriter are served from their stored copy.
+"""
+
+import argparse
+import csv
+import io
+import mmap
+import os
+import struct
+import zipfile
+
+import requests
+from requests.adapters import BaseAdapter
+from ricecooker import config
+from ricecooker.chefs import LineCook
+from ricecooker.utils.linecook import FolderExistsAction, process_folder, rel_path_from_chan_path
+from ricecooker.utils.jsontrees import TOPIC_NODE, write_tree_to_json_tree
+from ricecooker.utils.metadata_provider import (CsvMetadataProvider, path_to_tuple,
+    CHANNEL_INFO_HEADER, CONTENT_INFO_HEADER, DEFAULT_CHANNEL_INFO_FILENAME, DEFAULT_CONTENT_INFO_FILENAME)
+
+import dedup
+
+
+PREFIX = "zip:"
+CHUNK_SIZE = 2 * 1024 * 1024
+# Topics get the source ids of the channel unzipped in run.sh's ./content folder
+SOURCE_ID_DIR = "./content"
+LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")  # zip local file header, 30 bytes
+
+
+class ZipArchive(object):
+    """
+        Random access, memory-mapped reads of the members of a zip
+
+        Args:
+            path (str): zip file
+    """
+    def __init__(self, path):
+        self.path = path
+        self.zf = zipfile.ZipFile(path)
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # like `unzip -o`, the last member with a name wins
+        self.members = {info.filename: info for info in self.zf.infolist() if not info.is_dir()}
+        if dedup.MANIFEST in self.members:
+            rows = list(csv.reader(io.StringIO(self.read(dedup.MANIFEST).decode("utf-8"))))[1:]
+            for path, stored_at in rows:
+                self.members[path] = self.members[stored_at]
+
+    def __contains__(self, name):
+        return name in self.members
+
+    def chunks(self, name):
+        """
+            Yield the bytes of member name, slices of the mapping for stored members
+        """
+        info = self.members[name]
+        if info.compress_type != zipfile.ZIP_STORED:
+            with self.zf.open(info) as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    yield chunk
+            return
+        fields = LOCAL_HEADER.unpack_from(self.map, info.header_offset)
+        start = info.header_offset + LOCAL_HEADER.size + fields[-2] + fields[-1]
+        data = memoryview(self.map)[start:start + info.file_size]
+        for offset in range(0, info.file_size, CHUNK_SIZE):
+            yield data[offset:offset + CHUNK_SIZE]
+
+    def read(self, name):
+        return b"".join(self.chunks(name))
+
+    def size(self, name):
+        return self.members[name].file_size
+
+    def walk(self, top):
+        """
+            os.walk(top) over the folders of the archive, top-down and sorted
+        """
+        folders = {top: ([], [])}    # folder -> (dirnames, filenames)
+
+        def folder_entry(folder):
+            if folder not in folders:
+                parent, dirname = folder.rsplit("/", 1)
+                folder_entry(parent)[0].append(dirname)
+                folders[folder] = ([], [])
+            return folders[folder]
+
+        for name in sorted(self.members):
+            if name.startswith(top + "/"):
+                parent, filename = name.rsplit("/", 1)
+                folder_entry(parent)[1].append(filename)
+        stack = [top]
+        while len(stack) > 0:
+            folder = stack.pop()
+            dirnames, filenames = folders[folder]
+            dirnames.sort()
+            yield folder, dirnames, filenames
+            stack.extend("{}/{}".format(folder, dirname) for dirname in reversed(dirnames))
+
+    def close(self):
+        self.map.close()
+        self.zf.close()
+
+
+class MemberStream(object):
+    """
+        Raw response of a member, requests iterates it with stream()
+    """
+    def __init__(self, archive, name):
+        self.archive = archive
+        self.name = name
+
+    def stream(self, chunk_size=None, decode_content=None):
+        return self.archive.chunks(self.name)
+
+    def read(self, size=None):
+        return self.archive.read(self.name)
+
+    def close(self):
+        pass
+
+
+class ZipMemberAdapter(BaseAdapter):
+    """
+        requests adapter that answers zip:/<name> urls with the member name of the archive
+    """
+    def __init__(self, archive):
+        super(ZipMemberAdapter, self).__init__()
+        self.archive = archive
+
+    def send(self, request, **kwargs):
+        name = request.url[len(PREFIX):].lstrip("/")
+        response = requests.Response()
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        if name in self.archive:
+            response.status_code = 200
+            response.reason = "OK"
+            response.headers["Content-Length"] = str(self.archive.size(name))
+            response.raw = MemberStream(self.archive, name)
+        else:
+            response.status_code = 404
+            response.reason = "Not in {}".format(self.archive.path)
+            response.raw = io.BytesIO(b"")
+        return response
+
+    def close(self):
+        pass
+
+
+class ZipMetadataProvider(CsvMetadataProvider):
+    """
+        CsvMetadataProvider that reads the csv files from the archive,
+        they are siblings of the channel folder like in a channeldir
+    """
+    def __init__(self, archive, channeldir, **kwargs):
+        self.archive = archive
+        super(ZipMetadataProvider, self).__init__(channeldir, **kwargs)
+
+    def read_csv(self, filename):
+        folder = os.path.dirname(self.channeldir[len(PREFIX):].lstrip("/"))
+        name = "{}/{}".format(folder, filename) if folder else filename
+        lines = io.StringIO(self.archive.read(name).decode("utf-8"), newline=None).readlines()
+        return list(csv.DictReader([line for line in lines if len(line.strip()) > 0]))
+
+    def validate_format(self):
+        for filename, header in [(self.contentinfo, CONTENT_INFO_HEADER), (self.channelinfo, CHANNEL_INFO_HEADER)]:
+            if set(self.read_csv(filename)[0].keys()) != set(header):
+                raise ValueError('Unexpected CSV file header for ' + filename)
+
+    def cache_contentinfo(self):
+        for row in self.read_csv(self.contentinfo):
+            row_dict = self._map_content_row_to_dict(row)
+            self.cache[path_to_tuple(row_dict['chan_path'], windows=self.winpaths)] = row_dict
+
+    def get_channel_info(self):
+        rows = self.read_csv(self.channelinfo)
+        if len(rows) > 1:
+            raise ValueError('Found multiple channel rows in ' + self.channelinfo)
+        return self._map_channel_row_to_dict(rows[0])
+
+
+def build_json_tree(archive, metadata_provider, json_tree_path):
+    """
+        build_ricecooker_json_tree() over the folders of the archive
+    """
+    channeldir = metadata_provider.channeldir
+    channel_info = metadata_provider.get_channel_info()
+    thumbnail_chan_path = channel_info.get('thumbnail_chan_path', None)
+    ricecooker_json_tree = dict(
+        dirname=channeldir.rsplit("/", 1)[-1],
+        title=channel_info['title'],
+        description=channel_info['description'],
+        source_domain=channel_info['source_domain'],
+        source_id=channel_info['source_id'],
+        language=channel_info['language'],
+        thumbnail=rel_path_from_chan_path(thumbnail_chan_path, channeldir) if thumbnail_chan_path else None,
+        children=[],
+    )
+    content_folders = archive.walk(channeldir[len(PREFIX):].lstrip("/"))
+    next(content_folders)  # the channel folder is the tree itself
+    for folder, _subfolders, filenames in content_folders:
+        rel_path = PREFIX + "/" + folder
+        config.LOGGER.info('processing folder ' + rel_path)
+        process_folder(ricecooker_json_tree, rel_path, filenames, metadata_provider)
+    set_topic_source_ids(ricecooker_json_tree, SOURCE_ID_DIR + "/" + ricecooker_json_tree['dirname'])
+    write_tree_to_json_tree(json_tree_path, ricecooker_json_tree)
+    config.LOGGER.info('Archive tree stored in ' + json_tree_path)
+
+
+def set_topic_source_ids(node, rel_path):
+    """
+        Give the topics under node the source ids they get under the folder rel_path
+    """
+    for child in node['children']:
+        if child['kind'] == TOPIC_NODE:
+            child_rel_path = rel_path + "/" + child['dirname']
+            child['source_id'] = 'sourceid:' + child_rel_path
+            set_topic_source_ids(child, child_rel_path)
+
+
+class ZipLineCook(LineCook):
+    """
+        LineCook that also reads the channel from a zip with --archive
+    """
+    def __init__(self, *args, **kwargs):
+        super(LineCook, self).__init__(*args, **kwargs)
+        subclasses = self.__class__.__mro__[:-6]     # all subclasses after this
+        self.arg_parser = argparse.ArgumentParser(
+            description="Upload the folder hierarchy or the archive to the content workshop.",
+            add_help=not any(['__init__' in c.__dict__.keys() for c in subclasses]),
+            parents=[self.arg_parser]
+        )
+        source = self.arg_parser.add_mutually_exclusive_group(required=True)
+        source.add_argument('--channeldir', action=FolderExistsAction,
+            help='The dir that corresponds to the root of the channel.')
+        source.add_argument('--archive',
+            help='The zip written by souschef.py, read in place without unzipping it.')
+        self.arg_parser.add_argument('--channelinfo', default=DEFAULT_CHANNEL_INFO_FILENAME,
+            help='The filename that conains the channel metadata (assumed to be sibling of channeldir)')
+        self.arg_parser.add_argument('--contentinfo', default=DEFAULT_CONTENT_INFO_FILENAME,
+            help='The filename that conains the content metadata (assumed to be sibling of channeldir)')
+
+    def pre_run(self, args, options):
+        if args.get('archive') is None:
+            return super(ZipLineCook, self).pre_run(args, options)
+        archive = ZipArchive(args['archive'])
+        folders = {name.split("/")[0] for name in archive.members if "/" in name}
+        if len(folders) != 1:
+            raise ValueError('Expected a single channel folder in {}, found {}'.format(args['archive'], sorted(folders)))
+        args['channeldir'] = PREFIX + "/" + folders.pop()
+        config.DOWNLOAD_SESSION.mount(PREFIX, ZipMemberAdapter(archive))
+        self.metadata_provider = ZipMetadataProvider(archive, args['channeldir'],
+            channelinfo=args['channelinfo'], contentinfo=args['contentinfo'])
+        kwargs = {}
+        kwargs.update(args)
+        kwargs.update(options)
+        build_json_tree(archive, self.metadata_provider, self.get_json_tree_path(**kwargs))